@@ -1,37 +1,119 @@
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
 
+import io
+import os
 import textwrap
-from tempfile import NamedTemporaryFile
+from urllib.parse import quote
 
-from fastapi.responses import FileResponse
 from docx import Document
+import orjson
 from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfgen import canvas
 
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import Depends, FastAPI, Request, Form
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
-from src.runner import run_essay_graph
+from src.graph_builder import build_async_graph
+from src.runner import arun_essay_graph, astream_essay_graph
+from src.batch import apply_finalize_batch, submit_finalize_batch
 
 # Load env vars
 load_dotenv()
 
-app = FastAPI(title="Essay Agent – HITL Workflow")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (C serializer, several times faster)."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Graph with an async checkpointer, compiled once for the app's lifetime
+    async with build_async_graph() as async_graph:
+        app.state.graph = async_graph
+        yield
+
+
+app = FastAPI(
+    title="Essay Agent – HITL Workflow",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan,
+)
+
+# Compress HTML/JSON/CSS responses (SSE streams are left alone)
+app.add_middleware(GZipMiddleware, minimum_size=500)
+
+# Browser cache lifetime for /static (assets are revalidated with their ETag)
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "86400"))
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with a Cache-Control header, so repeat visits skip the request."""
+
+    def file_response(self, *args: Any, **kwargs: Any):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}"
+        return response
+
 
 # Static + templates (adapt paths to your project)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
 
+def _docx_template_bytes() -> bytes:
+    # python-docx unpacks its default template on every Document() call:
+    # do it once and keep the serialized package.
+    buf = io.BytesIO()
+    Document().save(buf)
+    return buf.getvalue()
+
+
+DOCX_TEMPLATE_BYTES = _docx_template_bytes()
+
+# Load the (standard, non-embedded) font metrics once, not on the first export
+for _font in ("Helvetica", "Helvetica-Bold"):
+    pdfmetrics.getFont(_font)
+
+# PDF export: quick-and-dirty wrapping per line, one wrapper reused
+_PDF_WRAPPER = textwrap.TextWrapper(width=90)
+PDF_BODY_LEADING = 13.2  # 1.2 x 11pt
+
+
+class _SlugTable(dict):
+    """
+    str.translate() table for _safe_filename: keeps alphanumerics (accented
+    letters included), "-" and "_", maps anything else to "_". Entries are
+    computed on first use and cached up to _SLUG_CACHED_CODEPOINTS (Latin
+    scripts), so translate() stays in C for them and the table stays
+    bounded; rarer characters are computed each time.
+    """
+
+    def __missing__(self, codepoint: int) -> str:
+        char = chr(codepoint)
+        value = char if char.isalnum() or char in ("-", "_") else "_"
+        if codepoint < _SLUG_CACHED_CODEPOINTS:
+            self[codepoint] = value
+        return value
+
+
+_SLUG_CACHED_CODEPOINTS = 0x250  # Basic Latin .. Latin Extended-B
+_SLUG_TABLE = _SlugTable()
+
+
 def _safe_filename(title: str, ext: str) -> str:
     # Very simple slug
-    base = "".join(
-        c if c.isalnum() or c in ("-", "_") else "_"
-        for c in title.strip().replace(" ", "_")
-    )
+    base = title.strip().replace(" ", "_").translate(_SLUG_TABLE)
     if not base:
         base = "essay"
     return f"{base}.{ext}"
@@ -50,11 +132,7 @@ async def index(request: Request):
     )
 
 
-@app.post("/api/run")
-async def run_agent(
-    prompt: str = Form(...),
-    thread_id: Optional[str] = Form(None),
-
+def _hitl_inputs(
     clarification_answers: Optional[str] = Form(None),
     plan_feedback: Optional[str] = Form(None),
     draft_feedback_human: Optional[str] = Form(None),
@@ -64,134 +142,289 @@ async def run_agent(
     skip_clarification: Optional[str] = Form(None),  # "on" if checked
     skip_plan_review: Optional[str] = Form(None),
     skip_draft_review: Optional[str] = Form(None),
-):
+) -> Dict[str, Any]:
     """
-    Run the LangGraph workflow for a given user prompt, with optional HITL inputs.
+    Parse the HITL form fields into run_essay_graph() keyword arguments.
     """
-
     # Convert draft_approved checkbox to bool or None
     draft_approved_bool: Optional[bool] = None
     if draft_approved is not None:
         # if checkbox is checked, HTML sends "on" (or "true" from JS)
         draft_approved_bool = True
 
-    # Convert skip checkboxes to bools
-    skip_clarification_bool = bool(skip_clarification)
-    skip_plan_review_bool = bool(skip_plan_review)
-    skip_draft_review_bool = bool(skip_draft_review)
+    return {
+        "clarification_answers": clarification_answers,
+        "plan_feedback": plan_feedback,
+        "draft_feedback_human": draft_feedback_human,
+        "draft_approved": draft_approved_bool,
+        "final_feedback": final_feedback,
+        # Convert skip checkboxes to bools
+        "skip_clarification": bool(skip_clarification),
+        "skip_plan_review": bool(skip_plan_review),
+        "skip_draft_review": bool(skip_draft_review),
+    }
+
+
+def _result_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Subset of the final EssayState returned to the front-end."""
+    return {
+        "thread_id": result.get("thread_id"),
+        "mode": result.get("mode"),
+        "topic": result.get("topic"),
+        "instructions": result.get("instructions"),
+        "clarification_questions": result.get("clarification_questions"),
+        "clarification_answers": result.get("clarification_answers"),
+        "plan": result.get("plan"),
+        "plan_validated": result.get("plan_validated"),
+        "research_notes": result.get("research_notes"),
+        "background_notes": result.get("background_notes"),
+        "draft": result.get("draft"),
+        "critique": result.get("critique"),
+        "critique_score": result.get("critique_score"),
+        # The final essay is stored once, as `answer`
+        "final_draft": result.get("answer") if result.get("final_approved") else None,
+        "answer": result.get("answer"),
+        "saved": result.get("saved"),
+        "final_approved": result.get("final_approved"),
+    }
+
 
+# Streamed LLM tokens packed into one SSE `token` frame
+SSE_TOKENS_PER_FRAME = 50
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+@app.post("/api/run")
+async def run_agent(
+    request: Request,
+    prompt: str = Form(...),
+    thread_id: Optional[str] = Form(None),
+    hitl_inputs: Dict[str, Any] = Depends(_hitl_inputs),
+):
+    """
+    Run the LangGraph workflow for a given user prompt, with optional HITL inputs.
+    """
     try:
-        result = run_essay_graph(
+        # Async graph: checkpoints go through aiosqlite and the blocking LLM
+        # calls run in LangGraph's executor, so the event loop stays free.
+        result = await arun_essay_graph(
+            request.app.state.graph,
             prompt,
             thread_id=thread_id,
-            clarification_answers=clarification_answers,
-            plan_feedback=plan_feedback,
-            draft_feedback_human=draft_feedback_human,
-            draft_approved=draft_approved_bool,
-            final_feedback=final_feedback,
-            skip_clarification=skip_clarification_bool,
-            skip_plan_review=skip_plan_review_bool,
-            skip_draft_review=skip_draft_review_bool,
+            **hitl_inputs,
         )
-        return JSONResponse(
-            {
-                "thread_id": result.get("thread_id"),
-                "mode": result.get("mode"),
-                "topic": result.get("topic"),
-                "instructions": result.get("instructions"),
-                "clarification_questions": result.get("clarification_questions"),
-                "clarification_answers": result.get("clarification_answers"),
-                "plan": result.get("plan"),
-                "plan_validated": result.get("plan_validated"),
-                "research_notes": result.get("research_notes"),
-                "draft": result.get("draft"),
-                "critique": result.get("critique"),
-                "final_draft": result.get("final_draft"),
-                "answer": result.get("answer"),
-                "saved": result.get("saved"),
-                "final_approved": result.get("final_approved"),
-            }
+        return FastJSONResponse(_result_payload(result))
+    except Exception as e:
+        return FastJSONResponse(
+            {"error": str(e)},
+            status_code=500,
+        )
+
+
+@app.post("/api/run/stream")
+async def run_agent_stream(
+    request: Request,
+    prompt: str = Form(...),
+    thread_id: Optional[str] = Form(None),
+    hitl_inputs: Dict[str, Any] = Depends(_hitl_inputs),
+) -> StreamingResponse:
+    """
+    Same as /api/run, but as Server-Sent Events:
+
+    - `token`: a chunk of the draft / final essay while it is being written
+    - `update`: fields written by a node as soon as it finishes, so the
+      draft is shown while the critique is still being computed
+    - `result`: the final payload (same shape as /api/run)
+    - `error`: the run failed
+    """
+
+    async def events() -> AsyncIterator[str]:
+        # Async graph (as /api/run): no worker thread is held while waiting
+        # for tokens. Tokens are sent SSE_TOKENS_PER_FRAME at a time (one
+        # frame per token would be mostly HTTP/SSE overhead); pending tokens
+        # are flushed before any other event.
+        token_node: Optional[str] = None
+        tokens: List[str] = []
+
+        def flush() -> str:
+            frame = _sse("token", {"node": token_node, "text": "".join(tokens)})
+            tokens.clear()
+            return frame
+
+        try:
+            async for kind, payload in astream_essay_graph(
+                request.app.state.graph, prompt, thread_id=thread_id, **hitl_inputs
+            ):
+                if kind == "token":
+                    node, text = payload
+                    if node != token_node and tokens:
+                        yield flush()
+                    token_node = node
+                    tokens.append(text)
+                    if len(tokens) >= SSE_TOKENS_PER_FRAME:
+                        yield flush()
+                    continue
+
+                if tokens:
+                    yield flush()
+                if kind == "update":
+                    node, values = payload
+                    yield _sse("update", {"node": node, "values": values})
+                else:
+                    yield _sse("result", _result_payload(payload))
+        except Exception as e:
+            if tokens:
+                yield flush()
+            yield _sse("error", {"error": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class FinalizeJob(BaseModel):
+    thread_id: str
+    final_feedback: str
+
+
+@app.post("/api/batch/finalize")
+async def batch_finalize(jobs: List[FinalizeJob]):
+    """
+    Queue the final polish of several threads through the OpenAI Batch API
+    (half price, results within 24h). Returns the batch id to poll.
+    """
+    try:
+        batch_id = await run_in_threadpool(
+            submit_finalize_batch,
+            [(job.thread_id, job.final_feedback) for job in jobs],
         )
+        return FastJSONResponse({"batch_id": batch_id})
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             {"error": str(e)},
             status_code=500,
         )
 
+
+@app.get("/api/batch/{batch_id}")
+async def batch_result(batch_id: str):
+    """
+    Batch status; once completed, the final answers are written back into
+    each thread (fetch them with /api/run on the same thread_id).
+    """
+    try:
+        return FastJSONResponse(await run_in_threadpool(apply_finalize_batch, batch_id))
+    except Exception as e:
+        return FastJSONResponse(
+            {"error": str(e)},
+            status_code=500,
+        )
+
+
+def _attachment_headers(filename: str) -> Dict[str, str]:
+    # Same Content-Disposition as FileResponse(filename=...)
+    quoted = quote(filename)
+    if quoted != filename:
+        return {"Content-Disposition": f"attachment; filename*=utf-8''{quoted}"}
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+DOCX_MEDIA_TYPE = (
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+)
+
+
+def _render_docx(topic: str, answer: str) -> bytes:
+    """`answer` as a .docx document (title + one paragraph per line)."""
+    doc = Document(io.BytesIO(DOCX_TEMPLATE_BYTES))
+    doc.add_heading(topic, level=1)
+    doc.add_paragraph("")  # blank line
+
+    for line in answer.splitlines():
+        if line.strip():
+            doc.add_paragraph(line)
+        else:
+            doc.add_paragraph("")  # keep blank lines
+
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
 @app.post("/api/export/docx")
 async def export_docx(
     answer: str = Form(...),
     topic: str = Form("Essay"),
-) -> FileResponse:
+) -> Response:
     """
     Create a .docx file from the essay answer and return it.
     """
-    with NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
-        doc = Document()
-        doc.add_heading(topic, level=1)
-        doc.add_paragraph("")  # blank line
-
-        for line in answer.splitlines():
-            if line.strip():
-                doc.add_paragraph(line)
-            else:
-                doc.add_paragraph("")  # keep blank lines
-
-        doc.save(tmp.name)
-        filename = _safe_filename(topic, "docx")
-
-    return FileResponse(
-        path=tmp.name,
-        media_type=(
-            "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-        ),
-        filename=filename,
+    # Built in memory (no temp file written, then read back to be sent)
+    content = await run_in_threadpool(_render_docx, topic, answer)
+    return Response(
+        content,
+        media_type=DOCX_MEDIA_TYPE,
+        headers=_attachment_headers(_safe_filename(topic, "docx")),
     )
 
 
+def _render_pdf(topic: str, answer: str) -> bytes:
+    """`answer` as a simple A4 PDF (title + wrapped body)."""
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    width, height = A4
+
+    # Title
+    text_obj = c.beginText(50, height - 50)
+    text_obj.setFont("Helvetica-Bold", 16)
+    text_obj.textLine(topic)
+    text_obj.moveCursor(0, -20)
+
+    # Body: wrap every line once up front (blank lines are kept), then
+    # draw page-sized slices instead of checking the cursor per line.
+    text_obj.setFont("Helvetica", 11, leading=PDF_BODY_LEADING)
+    lines = [
+        chunk
+        for line in answer.splitlines()
+        for chunk in (_PDF_WRAPPER.wrap(line) or [""])
+    ]
+    while lines:
+        # Lines that still fit above the bottom margin
+        capacity = max(int((text_obj.getY() - 50) // PDF_BODY_LEADING) + 1, 1)
+        page, lines = lines[:capacity], lines[capacity:]
+        text_obj.textLines(page, trim=0)
+
+        if lines:
+            c.drawText(text_obj)
+            c.showPage()
+            text_obj = c.beginText(50, height - 50)
+            text_obj.setFont("Helvetica", 11, leading=PDF_BODY_LEADING)
+
+    c.drawText(text_obj)
+    c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
 @app.post("/api/export/pdf")
 async def export_pdf(
     answer: str = Form(...),
     topic: str = Form("Essay"),
-) -> FileResponse:
+) -> Response:
     """
     Create a simple A4 PDF from the essay answer and return it.
     """
-    with NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        c = canvas.Canvas(tmp.name, pagesize=A4)
-        width, height = A4
-
-        # Title
-        text_obj = c.beginText(50, height - 50)
-        text_obj.setFont("Helvetica-Bold", 16)
-        text_obj.textLine(topic)
-        text_obj.moveCursor(0, -20)
-
-        # Body
-        text_obj.setFont("Helvetica", 11)
-        max_chars = 90  # quick-and-dirty wrapping per line
-        for line in answer.splitlines():
-            if not line.strip():
-                text_obj.textLine("")  # blank line
-                continue
-
-            for chunk in textwrap.wrap(line, max_chars):
-                # If we're too low on the page, start a new page
-                if text_obj.getY() < 50:
-                    c.drawText(text_obj)
-                    c.showPage()
-                    text_obj = c.beginText(50, height - 50)
-                    text_obj.setFont("Helvetica", 11)
-                text_obj.textLine(chunk)
-
-        c.drawText(text_obj)
-        c.showPage()
-        c.save()
-
-        filename = _safe_filename(topic, "pdf")
-
-    return FileResponse(
-        path=tmp.name,
+    # CPU-bound for long essays: rendered in the threadpool so other
+    # requests (and SSE streams) are not held up meanwhile; in memory, no
+    # temp file round-trip
+    content = await run_in_threadpool(_render_pdf, topic, answer)
+    return Response(
+        content,
         media_type="application/pdf",
-        filename=filename,
+        headers=_attachment_headers(_safe_filename(topic, "pdf")),
     )
@@ -1,4 +1,18 @@
-from .runner import run_essay_graph
-from .graph_builder import graph
+from .runner import (
+    arun_essay_graph,
+    astream_essay_graph,
+    run_essay_graph,
+    run_essay_graphs,
+    stream_essay_graph,
+)
+from .graph_builder import build_async_graph, graph
 
-__all__ = ["run_essay_graph", "graph"]
+__all__ = [
+    "arun_essay_graph",
+    "astream_essay_graph",
+    "run_essay_graph",
+    "run_essay_graphs",
+    "stream_essay_graph",
+    "build_async_graph",
+    "graph",
+]
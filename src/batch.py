@@ -0,0 +1,140 @@
+from typing import Any, Dict, List, Tuple
+
+import orjson
+from openai import OpenAI
+
+from .config import api_key, http_client, llm
+from .graph_builder import graph
+from .nodes import PRUNED_AFTER_FINALIZE, finalize_prompts
+
+# Plain OpenAI client for the Files / Batches endpoints (same HTTP pool as llm)
+client = OpenAI(api_key=api_key, http_client=http_client)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+
+def submit_batch(requests: List[Dict[str, Any]]) -> str:
+    """
+    Submit chat completions through the OpenAI Batch API.
+
+    `requests` is a list of `{"custom_id": str, "body": {...}}` where `body`
+    is a regular chat completions payload. Batch jobs are billed at half
+    price and don't count against the synchronous rate limits, at the cost
+    of a completion window of up to 24h. Returns the batch id.
+    """
+    lines = [
+        orjson.dumps(
+            {
+                "custom_id": req["custom_id"],
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": req["body"],
+            }
+        )
+        for req in requests
+    ]
+    upload = client.files.create(
+        file=("batch.jsonl", b"\n".join(lines)),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=upload.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+    )
+    return batch.id
+
+
+def get_batch_results(batch_id: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Return `(status, {custom_id: content})` for a batch.
+
+    Results are empty until the batch status is "completed".
+    """
+    batch = client.batches.retrieve(batch_id)
+    if batch.status != "completed" or not batch.output_file_id:
+        return batch.status, {}
+
+    results: Dict[str, str] = {}
+    # Parsed straight from the downloaded bytes (no str decode first)
+    for line in client.files.content(batch.output_file_id).content.splitlines():
+        if not line.strip():
+            continue
+        row = orjson.loads(line)
+        choices = ((row.get("response") or {}).get("body") or {}).get("choices") or []
+        if choices:
+            results[row["custom_id"]] = choices[0]["message"]["content"]
+    return batch.status, results
+
+
+def _chat_body(system: str, user: str) -> Dict[str, Any]:
+    return {
+        "model": llm.model_name,
+        "temperature": llm.temperature,
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ],
+    }
+
+
+def _thread_config(thread_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def submit_finalize_batch(jobs: List[Tuple[str, str]]) -> str:
+    """
+    Queue the final polish (HITL 4) of several threads as one batch.
+
+    `jobs` is a list of `(thread_id, final_feedback)`; each thread must
+    already have a draft. Use `apply_finalize_batch` to write the results
+    back into the threads once the batch is done.
+    """
+    requests = []
+    for thread_id, final_feedback in jobs:
+        values = graph.get_state(_thread_config(thread_id)).values
+        draft = values.get("draft", "")
+        if not draft:
+            raise ValueError(f"Thread {thread_id} has no draft to finalize.")
+        system, user = finalize_prompts(
+            draft, values.get("critique", ""), final_feedback
+        )
+        requests.append({"custom_id": thread_id, "body": _chat_body(system, user)})
+
+    batch_id = submit_batch(requests)
+    # Keep the feedback in the threads: apply_finalize_batch records the
+    # answers as finalized with it, so a replay keeps them.
+    for thread_id, final_feedback in jobs:
+        graph.update_state(
+            _thread_config(thread_id),
+            {"final_feedback": final_feedback},
+            as_node="critic",
+        )
+    return batch_id
+
+
+def apply_finalize_batch(batch_id: str) -> Dict[str, Any]:
+    """
+    Poll a finalize batch; when completed, store each result as the
+    thread's final answer (as if the `finalize` node had produced it).
+    """
+    status, results = get_batch_results(batch_id)
+    for thread_id, final_draft in results.items():
+        config = _thread_config(thread_id)
+        values = graph.get_state(config).values
+        graph.update_state(
+            config,
+            {
+                "final_approved": True,
+                "answer": final_draft,
+                "saved": True,
+                # what finalize_essay checks before polishing again
+                "finalized_feedback": (
+                    values.get("final_feedback") or values.get("human_feedback", "")
+                ),
+                "finalized_revision": values.get("revision_count", 0),
+                **PRUNED_AFTER_FINALIZE,
+            },
+            as_node="finalize",
+        )
+    return {"batch_id": batch_id, "status": status, "thread_ids": list(results)}
@@ -0,0 +1,213 @@
+import hashlib
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import orjson
+
+from .config import (
+    ANSWER_CACHE_THRESHOLD,
+    BACKGROUND_CACHE_THRESHOLD,
+    LLM_CACHE_DB,
+    LLM_CACHE_TTL,
+    SEARCH_CACHE_TTL,
+    embeddings,
+)
+from .db import connect_sqlite
+
+
+class LLMCache:
+    """
+    Exact-match cache of LLM replies, persisted in SQLite (thread-safe).
+
+    Keyed by model, temperature, response format and both prompts: a repeated
+    call (HITL replays, retries, identical requests across threads) returns
+    the stored reply without a round-trip. Entries expire after `ttl` seconds
+    and are deleted when the cache is opened and every PURGE_EVERY writes,
+    so the file of a long-running server doesn't only grow.
+    """
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str, ttl: float, table: str = "llm_cache"):
+        self.ttl = ttl
+        self.table = table
+        self.stats = {"hits": 0, "misses": 0}
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        if ttl > 0:
+            self.purge()
+
+    def purge(self) -> int:
+        """Delete expired entries; returns how many."""
+        with self._lock:
+            deleted = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE created < ?",
+                (time.time() - self.ttl,),
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    @staticmethod
+    def cache_key(
+        model: str,
+        temperature: Optional[float],
+        system_prompt: str,
+        user_prompt: str,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        payload = orjson.dumps(
+            {
+                "model": model,
+                "temperature": temperature,
+                "sys": system_prompt,
+                "usr": user_prompt,
+                "fmt": response_format,
+            },
+            option=orjson.OPT_SORT_KEYS,
+        )
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT response, created FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or time.time() - row[1] > self.ttl:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, response, created) "
+                "VALUES (?, ?, ?)",
+                (key, response, time.time()),
+            )
+            self._conn.commit()
+            self._writes += 1
+            due = self.ttl > 0 and self._writes % self.PURGE_EVERY == 0
+        if due:
+            self.purge()
+
+
+@lru_cache(maxsize=256)
+def _embed_cached(text: str) -> Optional[bytes]:
+    # Raises on API errors: failures are not memoized, the next call retries
+    vector = np.asarray(embeddings.embed_query(text), dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return (vector / norm).tobytes() if norm else None
+
+
+def _embed(text: str) -> Optional[bytes]:
+    """Normalized float32 embedding of `text` (shared by every namespace)."""
+    try:
+        return _embed_cached(text)
+    except Exception:
+        # No embedding -> no semantic lookup, the caller just asks the LLM
+        return None
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache of replies, for requests that are paraphrases of
+    one already answered ("write me an essay on X" / "draft an essay about X").
+
+    Embeddings are stored as float32 blobs next to the exact cache; a lookup
+    returns the reply of the most similar stored request if its cosine
+    similarity reaches `threshold`. One `namespace` per kind of reply.
+    Expired entries are purged like LLMCache's (at startup, every
+    PURGE_EVERY writes).
+    """
+
+    PURGE_EVERY = LLMCache.PURGE_EVERY
+
+    def __init__(self, path: str, namespace: str, threshold: float, ttl: float):
+        self.namespace = namespace
+        self.threshold = threshold
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0}
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_cache ("
+            "namespace TEXT NOT NULL, embedding BLOB NOT NULL, "
+            "response TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        if ttl > 0:
+            self.purge()
+
+    def purge(self) -> int:
+        """Delete this namespace's expired entries; returns how many."""
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM semantic_cache WHERE namespace = ? AND created < ?",
+                (self.namespace, time.time() - self.ttl),
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def _nearest(self, embedding: bytes) -> Tuple[float, Optional[str]]:
+        # Same blob length: ignore rows left by another embedding model
+        rows = self._conn.execute(
+            "SELECT embedding, response FROM semantic_cache "
+            "WHERE namespace = ? AND created >= ? AND length(embedding) = ?",
+            (self.namespace, time.time() - self.ttl, len(embedding)),
+        ).fetchall()
+        if not rows:
+            return 0.0, None
+        matrix = np.frombuffer(b"".join(row[0] for row in rows), dtype=np.float32)
+        query = np.frombuffer(embedding, dtype=np.float32)
+        scores = matrix.reshape(len(rows), -1) @ query
+        best = int(np.argmax(scores))
+        return float(scores[best]), rows[best][1]
+
+    def get(self, text: str) -> Optional[str]:
+        embedding = _embed(text) if self.ttl > 0 else None
+        if embedding is None:
+            return None
+        with self._lock:
+            score, response = self._nearest(embedding)
+            if response is None or score < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return response
+
+    def set(self, text: str, response: str) -> None:
+        embedding = _embed(text) if self.ttl > 0 else None
+        if embedding is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO semantic_cache (namespace, embedding, response, created) "
+                "VALUES (?, ?, ?, ?)",
+                (self.namespace, embedding, response, time.time()),
+            )
+            self._conn.commit()
+            self._writes += 1
+            due = self._writes % self.PURGE_EVERY == 0
+        if due:
+            self.purge()
+
+
+llm_cache = LLMCache(LLM_CACHE_DB, LLM_CACHE_TTL)
+# Web search results (JSON), keyed by the normalized query
+search_cache = LLMCache(LLM_CACHE_DB, SEARCH_CACHE_TTL, table="search_cache")
+answer_cache = SemanticCache(
+    LLM_CACHE_DB, "open_question", ANSWER_CACHE_THRESHOLD, LLM_CACHE_TTL
+)
+# Background research notes, keyed by topic + outline + clarifications
+background_cache = SemanticCache(
+    LLM_CACHE_DB, "background_notes", BACKGROUND_CACHE_THRESHOLD, LLM_CACHE_TTL
+)
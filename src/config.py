@@ -1,7 +1,9 @@
 import os
 from pathlib import Path
+
+import httpx
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 # --------- Charger .env explicitement à la racine du projet ---------
 ROOT_DIR = Path(__file__).resolve().parent.parent  # .../agentic_system
@@ -19,13 +21,115 @@ if not api_key:
 print("[config] OPENAI_API_KEY loaded, length =", len(api_key))
 print("[config] OPENAI_API_KEY starts with:", api_key[:7] + "...")
 
+# --------- Pool HTTP partagé ---------
+# One keep-alive pool for every OpenAI call (sync + async), so parallel graph
+# branches and later models reuse warm TCP/TLS connections.
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+HTTP_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+# HTTP/2 multiplexes parallel calls (graph branches, batched runs) over one
+# connection; needs the `h2` package (httpx[http2]), HTTP/1.1 pool otherwise.
+try:
+    import h2  # noqa: F401
+
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# Retries (exponential backoff, honoring Retry-After) on 429 / 5xx /
+# connection errors: by the OpenAI SDK for every model, by tenacity for Tavily
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+TAVILY_MAX_RETRIES = int(os.getenv("TAVILY_MAX_RETRIES", "3"))
+
+http_client = httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT, http2=HTTP2)
+http_async_client = httpx.AsyncClient(
+    limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT, http2=HTTP2
+)
+
 # --------- LLM global ---------
 llm = ChatOpenAI(
     model="gpt-5.1",   # ou gpt-4o-mini / gpt-4.1
     temperature=0.4,
     api_key=api_key,        # <--- on force explicitement la clé ici
+    max_retries=OPENAI_MAX_RETRIES,
+    http_client=http_client,
+    http_async_client=http_async_client,
+)
+
+# Cheaper/faster model for first drafts; revisions (human feedback or a low
+# critic score) use `llm`. Set DRAFT_MODEL="" to write every draft with `llm`.
+DRAFT_MODEL = os.getenv("DRAFT_MODEL", "gpt-4.1-mini")
+draft_llm = (
+    ChatOpenAI(
+        model=DRAFT_MODEL,
+        temperature=0.4,
+        api_key=api_key,
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+    if DRAFT_MODEL
+    else llm
+)
+
+# Intent classification: a small model emitting a single (biased) token;
+# `intent_llm` is the same model for the batched classifier (JSON labels)
+INTENT_MODEL = os.getenv("INTENT_MODEL", "gpt-4.1-nano")
+intent_llm = ChatOpenAI(
+    model=INTENT_MODEL,
+    temperature=0,
+    api_key=api_key,
+    max_retries=OPENAI_MAX_RETRIES,
+    http_client=http_client,
+    http_async_client=http_async_client,
+)
+
+# Embeddings for the semantic cache (open-question answers, background notes).
+# A lookup must stay cheaper than the call it saves: short timeout and no
+# retries, a failed lookup just falls through to the LLM.
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "5"))
+embeddings = OpenAIEmbeddings(
+    model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+    api_key=api_key,
+    max_retries=0,
+    request_timeout=EMBEDDING_TIMEOUT,
+    http_client=http_client,
 )
 
+# Client-side rate limits (match your OpenAI tier)
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "500000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Completion tokens reserved per call when the model has no max_tokens
+LLM_OUTPUT_TOKENS_ESTIMATE = 1500
+
+# Max drafts written per thread (first draft + human-driven revisions)
+MAX_DRAFT_REVISIONS = int(os.getenv("MAX_DRAFT_REVISIONS", "5"))
+# When the AI reviews the draft (skip_draft_review): drafts scored at least
+# this (0-10) go straight to finalize, lower ones get a critic-driven rewrite
+AUTO_REVISE_MIN_SCORE = int(os.getenv("AUTO_REVISE_MIN_SCORE", "8"))
+MAX_AUTO_REVISIONS = int(os.getenv("MAX_AUTO_REVISIONS", "1"))
+
+# Web research: one Tavily sub-query per outline section, run concurrently
+RESEARCH_MAX_QUERIES = int(os.getenv("RESEARCH_MAX_QUERIES", "6"))
+RESEARCH_MAX_CONCURRENCY = int(os.getenv("RESEARCH_MAX_CONCURRENCY", "5"))
+# Characters kept from each result's snippet in the notes given to the writer
+RESEARCH_SNIPPET_CHARS = int(os.getenv("RESEARCH_SNIPPET_CHARS", "300"))
+# Per search (seconds); Tavily requests go through the shared HTTP pool
+TAVILY_TIMEOUT = float(os.getenv("TAVILY_TIMEOUT", "30"))
+# Tavily results are reused for identical (normalized) queries; 0 disables
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(12 * 3600)))
+# Start the research while a thread waits at the plan review gate (warms the
+# search / LLM caches for the next call); "0" disables it
+SPECULATIVE_RESEARCH = os.getenv("SPECULATIVE_RESEARCH", "1") != "0"
+
+# Exact-match LLM reply cache (SQLite); LLM_CACHE_TTL=0 disables it
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.sqlite")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+# Cosine similarity needed to reuse a reply for a paraphrased request
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+BACKGROUND_CACHE_THRESHOLD = float(os.getenv("BACKGROUND_CACHE_THRESHOLD", "0.95"))
+
 # Graph / checkpoints config
 CHECKPOINTS_DB = os.getenv("CHECKPOINTS_DB", "checkpoints.sqlite")
 DEFAULT_RECURSION_LIMIT = 50
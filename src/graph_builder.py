@@ -1,34 +1,37 @@
-import sqlite3
-from typing import Tuple
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Tuple
 
+import aiosqlite
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 
 from .state import EssayState
 from .config import CHECKPOINTS_DB
+from .db import SQLITE_PRAGMAS, checkpoint_serde, connect_sqlite
 from .nodes import (
     classify_intent,
     analyze_topic,
     plan_essay,
     plan_human_review,
     research_agentic,
+    aresearch_agentic,
+    research_background,
+    aresearch_background,
     write_draft,
     critic_node,
-    save_to_db,
     finalize_essay,
     basic_llm_response,
-    stop_after_analyze,
-    stop_after_plan_review,
-    stop_after_critic,
-    route_from_classify,
-    route_from_analyze,
+    intent_gate,
+    route_from_gate,
     route_from_plan_review,
     route_from_critic,
 )
 
 
-def build_graph() -> Tuple[object, SqliteSaver]:
-    """Build the LangGraph graph and attach a SqliteSaver checkpointer."""
+def _build_workflow() -> StateGraph:
+    """The essay workflow (nodes + edges), not yet compiled."""
     builder = StateGraph(EssayState)
 
     # Nodes
@@ -36,38 +39,37 @@ def build_graph() -> Tuple[object, SqliteSaver]:
     builder.add_node("analyze", analyze_topic)
     builder.add_node("plan", plan_essay)
     builder.add_node("plan_review", plan_human_review)
-    builder.add_node("research", research_agentic)
+    # Sync + async implementations: graph.invoke runs the former in threads,
+    # graph.ainvoke awaits the latter (concurrent I/O on the event loop)
+    builder.add_node(
+        "research", RunnableLambda(research_agentic, afunc=aresearch_agentic)
+    )
+    builder.add_node(
+        "background", RunnableLambda(research_background, afunc=aresearch_background)
+    )
     builder.add_node("write", write_draft)
     builder.add_node("critic", critic_node)
-    builder.add_node("save", save_to_db)
     builder.add_node("finalize", finalize_essay)
     builder.add_node("basic_reply", basic_llm_response)
+    builder.add_node("gate", intent_gate)
 
-    # HITL stop nodes
-    builder.add_node("stop_after_analyze", stop_after_analyze)
-    builder.add_node("stop_after_plan_review", stop_after_plan_review)
-    builder.add_node("stop_after_critic", stop_after_critic)
+    # HITL stops route straight to END: a no-op stop node would cost one
+    # more superstep (and checkpoint write) per call for nothing.
 
-    # Entry: START -> classify
+    # Entry: classify and analyze only need user_input, so they run in
+    # parallel (START fan-out) and join in "gate" before routing.
     builder.add_edge(START, "classify")
+    builder.add_edge(START, "analyze")
+    builder.add_edge(["classify", "analyze"], "gate")
 
-    # From classify: route depending on mode
+    # --- From gate: open question -> basic_reply, essay -> Gate 1 ---
     builder.add_conditional_edges(
-        "classify",
-        route_from_classify,
+        "gate",
+        route_from_gate,
         {
-            "analyze": "analyze",
             "basic_reply": "basic_reply",
-        },
-    )
-
-    # --- Gate 1: after analyze ---
-    builder.add_conditional_edges(
-        "analyze",
-        route_from_analyze,
-        {
             "plan": "plan",
-            "stop_after_analyze": "stop_after_analyze",
+            "stop_after_analyze": END,
         },
     )
 
@@ -79,12 +81,13 @@ def build_graph() -> Tuple[object, SqliteSaver]:
         route_from_plan_review,
         {
             "research": "research",
-            "stop_after_plan_review": "stop_after_plan_review",
+            "background": "background",
+            "stop_after_plan_review": END,
         },
     )
 
-    # Research -> write -> critic
-    builder.add_edge("research", "write")
+    # Research + background (parallel) -> write -> critic
+    builder.add_edge(["research", "background"], "write")
     builder.add_edge("write", "critic")
 
     # --- Gate 3: after critic ---
@@ -92,28 +95,44 @@ def build_graph() -> Tuple[object, SqliteSaver]:
         "critic",
         route_from_critic,
         {
-            "save": "save",
-            "stop_after_critic": "stop_after_critic",
+            "write": "write",
+            "finalize": "finalize",
+            "stop_after_critic": END,
         },
     )
 
-    # Save -> finalize
-    builder.add_edge("save", "finalize")
-
     # Endpoints
     builder.add_edge("basic_reply", END)
     builder.add_edge("finalize", END)
-    builder.add_edge("stop_after_analyze", END)
-    builder.add_edge("stop_after_plan_review", END)
-    builder.add_edge("stop_after_critic", END)
 
+    return builder
+
+
+def build_graph() -> Tuple[object, SqliteSaver]:
+    """Build the LangGraph graph and attach a SqliteSaver checkpointer."""
     # --- Compile with persistence (SqliteSaver) ---
-    conn = sqlite3.connect(CHECKPOINTS_DB, check_same_thread=False)
-    checkpointer = SqliteSaver(conn)
+    conn = connect_sqlite(CHECKPOINTS_DB)
+    checkpointer = SqliteSaver(conn, serde=checkpoint_serde)
 
-    graph = builder.compile(checkpointer=checkpointer)
+    graph = _build_workflow().compile(checkpointer=checkpointer)
     return graph, checkpointer
 
 
+@asynccontextmanager
+async def build_async_graph() -> AsyncIterator[object]:
+    """
+    Same graph with an AsyncSqliteSaver (aiosqlite), for `graph.ainvoke`.
+
+    Checkpoint writes no longer block the event loop, and the (sync) nodes
+    run in LangGraph's executor. Open it once for the app's lifetime (FastAPI
+    lifespan); it shares the checkpoints database with the sync `graph`,
+    and is a copy of it with another checkpointer (no second compilation).
+    """
+    async with aiosqlite.connect(CHECKPOINTS_DB) as conn:
+        await conn.executescript(SQLITE_PRAGMAS)
+        checkpointer = AsyncSqliteSaver(conn, serde=checkpoint_serde)
+        yield graph.copy(update={"checkpointer": checkpointer})
+
+
 # Build once at import time
 graph, checkpointer = build_graph()
@@ -1,13 +1,206 @@
-from langchain_core.messages import HumanMessage, SystemMessage
+import hashlib
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from .config import llm
+import tiktoken
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_openai import ChatOpenAI
+from langgraph.config import get_config
+from langgraph.constants import TAG_NOSTREAM
 
+from .cache import llm_cache
+from .config import (
+    LLM_CACHE_TTL,
+    LLM_OUTPUT_TOKENS_ESTIMATE,
+    OPENAI_MAX_RETRIES,
+    api_key,
+    http_async_client,
+    http_client,
+    llm,
+)
+from .rate_limit import llm_rate_limiter
 
-def call_llm(system_prompt: str, user_prompt: str) -> str:
-    """Helper to call the LLM with a simple system + human prompt."""
-    messages = [
-        SystemMessage(content=system_prompt),
+
+@lru_cache(maxsize=1)
+def _encoding() -> Optional[tiktoken.Encoding]:
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken downloads the encoding on first use; offline we estimate
+        return None
+
+
+def estimate_tokens(*texts: str, max_tokens: Optional[int] = None) -> int:
+    """Prompt tokens for `texts` plus the expected completion size."""
+    encoding = _encoding()
+    if encoding is not None:
+        prompt_tokens = sum(len(encoding.encode(text)) for text in texts)
+    else:
+        prompt_tokens = sum(len(text) for text in texts) // 4
+    return prompt_tokens + (max_tokens or LLM_OUTPUT_TOKENS_ESTIMATE)
+
+
+# Run configs for chat model calls (built once, not per call)
+_STREAM_CONFIG: RunnableConfig = {"run_name": "call_llm"}
+_NOSTREAM_CONFIG: RunnableConfig = {"run_name": "call_llm", "tags": [TAG_NOSTREAM]}
+
+
+@lru_cache(maxsize=64)
+def _system_message(system_prompt: str) -> SystemMessage:
+    # System prompts are a handful of fixed strings: build each message once
+    return SystemMessage(content=system_prompt)
+
+
+@lru_cache(maxsize=1024)
+def _prompt_cache_key(system_prompt: str, thread_id: str) -> str:
+    # OpenAI prompt-cache routing key: one per thread and system prompt, the
+    # calls sharing a long prefix (system prompt, topic, plan, notes)
+    return hashlib.sha256(f"{thread_id}\0{system_prompt}".encode()).hexdigest()[:16]
+
+
+def _current_thread_id() -> Optional[str]:
+    """thread_id of the graph run calling the LLM, if any."""
+    try:
+        return get_config().get("configurable", {}).get("thread_id")
+    except RuntimeError:
+        # called outside a runnable (e.g. classify_intents)
+        return None
+
+
+@lru_cache(maxsize=None)
+def single_token_llm(model: str, labels: Sequence[str]) -> ChatOpenAI:
+    """
+    Chat model that answers with a single token, biased towards `labels`.
+
+    For classification: max_tokens=1 and a +100 logit_bias on each label's
+    token, so the reply is one of the labels after a single decoding step.
+    The bias is only applied when every label is exactly one token (and
+    the tokenizer is available); the prompt must name the labels anyway.
+    """
+    logit_bias: Dict[int, int] = {}
+    encoding = _encoding()
+    if encoding is not None:
+        token_ids = [encoding.encode(label) for label in labels]
+        if all(len(ids) == 1 for ids in token_ids):
+            logit_bias = {ids[0]: 100 for ids in token_ids}
+
+    return ChatOpenAI(
+        model=model,
+        temperature=0,
+        max_tokens=1,
+        logit_bias=logit_bias or None,
+        api_key=api_key,
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+
+def _prepare_call(
+    system_prompt: str,
+    user_prompt: str,
+    response_format: Optional[Dict[str, Any]],
+    model: Optional[BaseChatModel],
+) -> Tuple[BaseChatModel, str, List[BaseMessage], Dict[str, Any]]:
+    """Chat model, cache key, messages and API kwargs for one call."""
+    chat = model or llm
+    key = llm_cache.cache_key(
+        chat.model_name,
+        chat.temperature,
+        system_prompt,
+        user_prompt,
+        response_format,
+    )
+    messages: List[BaseMessage] = [
+        _system_message(system_prompt),
         HumanMessage(content=user_prompt),
     ]
-    resp = llm.invoke(messages)
+    kwargs: Dict[str, Any] = {}
+    thread_id = _current_thread_id()
+    if thread_id:
+        kwargs["prompt_cache_key"] = _prompt_cache_key(system_prompt, str(thread_id))
+    if response_format:
+        kwargs["response_format"] = response_format
+    return chat, key, messages, kwargs
+
+
+def call_llm(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    response_format: Optional[Dict[str, Any]] = None,
+    model: Optional[BaseChatModel] = None,
+    stream: bool = False,
+) -> str:
+    """
+    Helper to call the LLM with a simple system + human prompt.
+
+    `response_format` is passed to the API as-is (JSON mode / JSON schema).
+    `model` overrides the default `llm` (e.g. `draft_llm`).
+    Only calls made with `stream=True` emit tokens to the graph's "messages"
+    stream; the others are tagged "nostream" so LangGraph doesn't buffer
+    and forward their tokens for nothing.
+
+    Replies are cached (see `src/cache.py`): the same prompts sent to the
+    same model return the stored reply instead of calling the API again.
+
+    OpenAI caches the longest previously seen prompt prefix on its side, so
+    prompts put what is stable for a thread first (system prompt, topic,
+    plan, notes) and what changes between calls (drafts, feedback) last.
+    Calls of one graph thread with the same system prompt share a
+    `prompt_cache_key` (from the run's thread_id), which routes them to the
+    same cache; other calls are routed by OpenAI on the prefix alone.
+    """
+    chat, key, messages, kwargs = _prepare_call(
+        system_prompt, user_prompt, response_format, model
+    )
+    if LLM_CACHE_TTL > 0:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    tokens = estimate_tokens(
+        system_prompt, user_prompt, max_tokens=getattr(chat, "max_tokens", None)
+    )
+    with llm_rate_limiter.limit(tokens):
+        config = _STREAM_CONFIG if stream else _NOSTREAM_CONFIG
+        resp = chat.invoke(messages, config=config, **kwargs)
+
+    if LLM_CACHE_TTL > 0:
+        llm_cache.set(key, resp.content)
+    return resp.content
+
+
+async def acall_llm(
+    system_prompt: str,
+    user_prompt: str,
+    *,
+    response_format: Optional[Dict[str, Any]] = None,
+    model: Optional[BaseChatModel] = None,
+    stream: bool = False,
+) -> str:
+    """
+    Async variant of `call_llm` (same arguments, cache and rate limit), for
+    nodes run by the async graph: concurrent calls are awaited together
+    (asyncio.gather) instead of each holding a worker thread.
+    """
+    chat, key, messages, kwargs = _prepare_call(
+        system_prompt, user_prompt, response_format, model
+    )
+    if LLM_CACHE_TTL > 0:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    tokens = estimate_tokens(
+        system_prompt, user_prompt, max_tokens=getattr(chat, "max_tokens", None)
+    )
+    async with llm_rate_limiter.alimit(tokens):
+        config = _STREAM_CONFIG if stream else _NOSTREAM_CONFIG
+        resp = await chat.ainvoke(messages, config=config, **kwargs)
+
+    if LLM_CACHE_TTL > 0:
+        llm_cache.set(key, resp.content)
     return resp.content
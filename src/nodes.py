@@ -1,13 +1,81 @@
-from typing import Optional
+import asyncio
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import httpx
+import orjson
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
 from .state import EssayState
-from .llm_utils import call_llm
+from .config import (
+    AUTO_REVISE_MIN_SCORE,
+    INTENT_MODEL,
+    MAX_AUTO_REVISIONS,
+    MAX_DRAFT_REVISIONS,
+    RESEARCH_MAX_CONCURRENCY,
+    RESEARCH_MAX_QUERIES,
+    RESEARCH_SNIPPET_CHARS,
+    SEARCH_CACHE_TTL,
+    TAVILY_MAX_RETRIES,
+    TAVILY_TIMEOUT,
+    draft_llm,
+    http_async_client,
+    http_client,
+    intent_llm,
+    llm,
+)
+from .cache import answer_cache, background_cache, search_cache
+from .llm_utils import acall_llm, call_llm, single_token_llm
 
 
 # ---------------------------
 # 1. Core Nodes
 # ---------------------------
 
+# Requests whose wording settles the intent, checked before any LLM call:
+# a request to write an essay, or a short question (not both: "How do I
+# write an essay?"). Other mentions of essays ("Proofread my essay",
+# "Summarize Montaigne's Essays") go to the classifier.
+_ESSAY_REQUEST_RE = re.compile(
+    r"\b(write|draft|compose|r[ée]dige[sz]?|r[ée]diger|[ée]cri(?:s|t|re|vez))\b"
+    r"[^.?!]{0,40}?\b(essays?|essais?|dissertations?)\b",
+    re.IGNORECASE,
+)
+# Wh-words only: "Can you write...", "Is it possible to get..." are often
+# requests for long pieces, those go to the classifier
+_OPEN_QUESTION_RE = re.compile(
+    r"^\s*(what|who|when|where|why|how|qui|quand|o[uù])\b", re.IGNORECASE
+)
+# Longer inputs may be detailed briefs: left to the classifier
+_OPEN_QUESTION_MAX_CHARS = 80
+
+
+def _match_intent(user_input: str) -> Optional[str]:
+    """Mode implied by the wording alone, or None when it takes the LLM."""
+    essay = _ESSAY_REQUEST_RE.search(user_input) is not None
+    question = (
+        len(user_input) < _OPEN_QUESTION_MAX_CHARS
+        and _OPEN_QUESTION_RE.match(user_input) is not None
+    )
+    if essay == question:
+        return None
+    return "essay" if essay else "open_question"
+
+
+CLASSIFY_SYSTEM_PROMPT = (
+    "You are an intent classifier for an essay assistant.\n"
+    "Decide if the user wants: (1) an ESSAY, or (2) a simple OPEN question answer.\n"
+    "Return exactly one word: 'essay' or 'open'."
+)
+
+
 def classify_intent(state: EssayState) -> EssayState:
     """
     Decide whether the user wants an essay or just an open question answer.
@@ -20,12 +88,18 @@ def classify_intent(state: EssayState) -> EssayState:
 
     user_input = state["user_input"]
 
-    system = (
-        "You are an intent classifier for an essay assistant.\n"
-        "Decide if the user wants: (1) an ESSAY, or (2) a simple OPEN_QUESTION answer.\n"
-        "Return exactly one word: 'essay' or 'open_question'."
-    )
-    result = call_llm(system, user_input).strip().lower()
+    # "Write an essay on ..." / "What is ...?": no model needed
+    matched_mode = _match_intent(user_input)
+    if matched_mode:
+        return {"mode": matched_mode}
+
+    # One output token from a small model, biased to the two labels (no
+    # semantic cache in front: embedding the request costs about as much)
+    result = call_llm(
+        CLASSIFY_SYSTEM_PROMPT,
+        user_input,
+        model=single_token_llm(INTENT_MODEL, ("essay", "open")),
+    ).strip().lower()
 
     if "essay" in result:
         mode = "essay"
@@ -38,172 +112,559 @@ def classify_intent(state: EssayState) -> EssayState:
     return {"mode": mode}
 
 
+def _strip_code_fence(reply: str) -> str:
+    """Drop markdown fences around a JSON reply (plain str scans, no regex)."""
+    return reply.replace("```json", "").replace("```", "").strip()
+
+
+CLASSIFY_BATCH_SYSTEM_PROMPT = (
+    "You are an intent classifier for an essay assistant.\n"
+    "For each numbered request, decide if the user wants: (1) an ESSAY, "
+    "or (2) a simple OPEN_QUESTION answer.\n"
+    "Return only a JSON array with one label per request, in order, "
+    "each being 'essay' or 'open_question'."
+)
+
+
+def classify_intents(user_inputs: List[str]) -> List[Optional[str]]:
+    """
+    Classify several requests with a single call to the small intent model.
+
+    Packs the numbered inputs into one prompt and asks for a JSON array of
+    labels, which saves one request (and one prompt prefill) per extra
+    input. Requests settled by their wording (`_match_intent`) are not sent.
+    Entries that can't be parsed come back as None and are left to
+    `classify_intent` inside the graph.
+    """
+    modes = [_match_intent(text) for text in user_inputs]
+    pending = [i for i, mode in enumerate(modes) if mode is None]
+    if not pending:
+        return modes
+
+    user = "\n".join(
+        f"{n}) {user_inputs[i]}" for n, i in enumerate(pending, 1)
+    )
+
+    try:
+        reply = call_llm(CLASSIFY_BATCH_SYSTEM_PROMPT, user, model=intent_llm)
+        labels = orjson.loads(_strip_code_fence(reply))
+    except ValueError:
+        labels = []
+    if not isinstance(labels, list) or len(labels) != len(pending):
+        return modes
+
+    for i, label in zip(pending, labels):
+        label = str(label).strip().lower()
+        modes[i] = label if label in ("essay", "open_question") else None
+    return modes
+
+
+# Structured output for analyze_topic: the API guarantees valid JSON
+ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "topic_analysis",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "topic": {"type": "string"},
+                "instructions": {"type": "string"},
+                "clarification_questions": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                },
+                "plan": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["topic", "instructions", "clarification_questions", "plan"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+ANALYZE_SYSTEM_PROMPT = (
+    "You are an assistant that extracts a clean essay TOPIC and INSTRUCTIONS "
+    "(tone, length, audience, constraints) from a user request.\n"
+    "You also propose clarification questions for the human, "
+    "and a clear bullet-point OUTLINE for the essay "
+    "(3–6 main sections with short explanations).\n\n"
+    "Return JSON with: topic, instructions, clarification_questions "
+    "(list of questions) and plan (list of outline sections)."
+)
+
+
 def analyze_topic(state: EssayState) -> EssayState:
     """
     Normalize the topic and extract constraints (style, length, etc.).
     Also produce clarification questions (HITL 1).
+
+    The outline is requested in the same call: it only depends on the topic
+    and instructions, so a separate planning round-trip is pure overhead.
+    `plan_essay` falls back to its own call if the plan is missing.
+
+    The reply is schema-enforced JSON (ANALYSIS_RESPONSE_FORMAT), parsed in
+    one go; if it doesn't parse, the request itself is the topic.
+
+    Runs in parallel with `classify_intent`; when the mode is already known
+    to be an open question, or the wording settles it (`_match_intent`, as
+    the classifier does), there is nothing to analyze.
     """
     user_input = state["user_input"]
+    if (state.get("mode") or _match_intent(user_input)) == "open_question":
+        return {}
 
-    system = (
-        "You are an assistant that extracts a clean essay TOPIC and INSTRUCTIONS "
-        "(tone, length, audience, constraints) from a user request.\n"
-        "You also propose clarification questions for the human.\n\n"
-        "Return the result as:\n"
-        "TOPIC: ...\n"
-        "INSTRUCTIONS: ...\n"
-        "CLARIFICATION_QUESTIONS:\n"
-        "- ...\n- ...\n- ..."
+    analysis = call_llm(
+        ANALYZE_SYSTEM_PROMPT, user_input, response_format=ANALYSIS_RESPONSE_FORMAT
     )
-    analysis = call_llm(system, user_input)
-
-    topic = ""
-    instructions = ""
-    clarification_questions = ""
-
-    current_section: Optional[str] = None
-
-    for line in analysis.splitlines():
-        upper = line.upper().strip()
-        if upper.startswith("TOPIC:"):
-            current_section = "topic"
-            topic = line.split(":", 1)[1].strip()
-        elif upper.startswith("INSTRUCTIONS:"):
-            current_section = "instructions"
-            instructions = line.split(":", 1)[1].strip()
-        elif upper.startswith("CLARIFICATION_QUESTIONS"):
-            current_section = "clarifications"
-        else:
-            if current_section == "instructions" and line.strip():
-                # allow multi-line instructions
-                instructions += " " + line.strip()
-            elif current_section == "clarifications" and line.strip():
-                clarification_questions += line + "\n"
+
+    try:
+        data = orjson.loads(analysis)
+        topic = str(data["topic"]).strip()
+        instructions = str(data["instructions"]).strip()
+        clarification_questions = "\n".join(
+            f"- {question}" for question in data["clarification_questions"]
+        )
+        plan = "\n".join(f"- {section}" for section in data["plan"])
+    except (ValueError, KeyError, TypeError):
+        # unusable reply: keep the request as the topic, plan_essay will
+        # write the outline
+        topic, instructions, clarification_questions, plan = "", "", "", ""
 
     if not topic:
         topic = user_input.strip()
 
-    return {
+    result: EssayState = {
         "topic": topic,
         "instructions": instructions,
         "clarification_questions": clarification_questions.strip(),
     }
+    if plan.strip():
+        result["plan"] = plan.strip()
+    return result
+
+
+PLAN_SYSTEM_PROMPT = (
+    "You are an expert essay planner. "
+    "Create a clear bullet-point OUTLINE for the essay.\n"
+    "Use 3–6 main sections with short explanations."
+)
 
 
 def plan_essay(state: EssayState) -> EssayState:
     """
     Produce a bullet-point outline for the essay.
+
+    Usually a no-op: `analyze_topic` already returns the outline.
     """
+    if state.get("plan"):
+        return {}
+
     topic = state.get("topic", "")
     instructions = state.get("instructions", "")
 
-    system = (
-        "You are an expert essay planner. "
-        "Create a clear bullet-point OUTLINE for the essay.\n"
-        "Use 3–6 main sections with short explanations."
-    )
     user = f"Topic: {topic}\nInstructions: {instructions}\n\nCreate the outline."
 
-    plan = call_llm(system, user)
+    plan = call_llm(PLAN_SYSTEM_PROMPT, user)
     return {"plan": plan}
 
 
+# "Looks good"-style plan feedback: nothing to revise (English / French)
+_PLAN_APPROVAL_RE = re.compile(
+    r"(ok(ay)?|fine|good|great|perfect|lgtm|approved?|yes|looks good|"
+    r"oui|d'accord|parfait|bien|tr[eè]s bien|c'est bon|valid[eé]e?)[\s.!]*",
+    re.IGNORECASE,
+)
+
+
+def is_plan_approval(feedback: Optional[str]) -> bool:
+    """
+    True when plan feedback is empty or only approves the plan (no revision
+    needed). Anything else, however short ("no", "redo"), revises it.
+    """
+    feedback = (feedback or "").strip()
+    return not feedback or _PLAN_APPROVAL_RE.fullmatch(feedback) is not None
+
+
+PLAN_REVIEW_SYSTEM_PROMPT = (
+    "You are helping to revise an outline based on HUMAN FEEDBACK.\n"
+    "Improve the plan accordingly, while keeping it clear and structured."
+)
+
+
 def plan_human_review(state: EssayState) -> EssayState:
     """
     Plan review node (HITL 2).
 
     - If plan_feedback is provided -> revise the plan.
-    - Otherwise keep current plan.
+    - Otherwise (or if it only approves it: "ok", "looks good") keep the
+      current plan.
     In both cases we consider the plan 'validated' for this run.
     """
     plan = state.get("plan", "")
     feedback = (state.get("plan_feedback") or "").strip()
 
-    if feedback:
-        system = (
-            "You are helping to revise an outline based on HUMAN FEEDBACK.\n"
-            "Improve the plan accordingly, while keeping it clear and structured."
-        )
+    if not is_plan_approval(feedback):
         user = (
             f"CURRENT PLAN:\n{plan}\n\n"
             f"HUMAN FEEDBACK:\n{feedback}\n\n"
             "Return the revised plan."
         )
-        improved_plan = call_llm(system, user)
+        improved_plan = call_llm(PLAN_REVIEW_SYSTEM_PROMPT, user)
         return {
             "plan": improved_plan,
             "plan_validated": True,
         }
 
-    # No feedback: we just mark it validated
+    # No (actionable) feedback: we just mark it validated
     return {"plan_validated": True}
 
 
-def research_agentic(state: EssayState) -> EssayState:
+# List marker of an outline line: "-", "*", "•", "1.", "2)", "III."
+_PLAN_MARKER_RE = re.compile(r"^(?:[-*•]|(?:\d+|[IVXivx]+)[.)])\s*")
+
+
+def _plan_sections(plan: str, limit: int) -> List[str]:
     """
-    Agentic web search step.
+    Distinct top-level items of a bullet/numbered outline (at most `limit`).
+    A repeated item (case-insensitive) would only repeat a search.
+    """
+    sections = []
+    seen = set()
+    for line in plan.splitlines():
+        if not line or line[0].isspace():
+            continue  # blank line or nested bullet
+        item = _PLAN_MARKER_RE.sub("", line).strip()
+        if item and item.lower() not in seen:
+            seen.add(item.lower())
+            sections.append(item)
+            if len(sections) == limit:
+                break
+    return sections
+
+
+# Positional arguments of TavilySearchAPIWrapper.raw_results, as passed by
+# TavilySearchResults, in order
+_TAVILY_PARAM_NAMES = (
+    "max_results",
+    "search_depth",
+    "include_domains",
+    "exclude_domains",
+    "include_answer",
+    "include_raw_content",
+    "include_images",
+)
+
+
+def _retryable_search_error(error: BaseException) -> bool:
+    """Rate limited, server error or connection problem: worth a retry."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in (429, 500, 502, 503, 504)
+    return isinstance(error, httpx.TransportError)
+
+
+# Exponential backoff with jitter, so concurrent sub-queries don't retry in
+# lockstep; the last error is re-raised (the tool turns it into a message)
+_TAVILY_RETRY = retry(
+    retry=retry_if_exception(_retryable_search_error),
+    stop=stop_after_attempt(TAVILY_MAX_RETRIES + 1),
+    wait=wait_exponential_jitter(initial=1, max=30),
+    reraise=True,
+)
+
+
+# Tavily tool, built once (import + pydantic validation + HTTP wrapper).
+# None if langchain_community or TAVILY_API_KEY is missing: research_agentic
+# then records the error instead of searching.
+try:
+    try:
+        # recommended import
+        from langchain_community.tools.tavily_search.tool import (
+            TavilySearchResults,
+        )
+    except ImportError:
+        from langchain_community.tools.tavily_search import (  # type: ignore
+            TavilySearchResults,
+        )
+    from langchain_community.utilities.tavily_search import (
+        TAVILY_API_URL,
+        TavilySearchAPIWrapper,
+    )
+
+    class _PooledTavilyAPIWrapper(TavilySearchAPIWrapper):
+        """
+        Tavily search over the shared httpx clients (src/config.py).
+
+        The stock wrapper opens a new connection per search (`requests.post`,
+        a new aiohttp session); these keep-alive pools reuse warm TCP/TLS
+        connections across the concurrent sub-queries and later runs.
+        """
+
+        def _search_params(self, query: str, *args: Any) -> Dict[str, Any]:
+            return {
+                "api_key": self.tavily_api_key.get_secret_value(),
+                "query": query,
+                **dict(zip(_TAVILY_PARAM_NAMES, args)),
+            }
+
+        @_TAVILY_RETRY
+        def raw_results(self, query: str, *args: Any) -> Dict:  # type: ignore[override]
+            response = http_client.post(
+                f"{TAVILY_API_URL}/search",
+                json=self._search_params(query, *args),
+                timeout=TAVILY_TIMEOUT,
+            )
+            response.raise_for_status()
+            return response.json()
+
+        @_TAVILY_RETRY
+        async def raw_results_async(self, query: str, *args: Any) -> Dict:  # type: ignore[override]
+            response = await http_async_client.post(
+                f"{TAVILY_API_URL}/search",
+                json=self._search_params(query, *args),
+                timeout=TAVILY_TIMEOUT,
+            )
+            response.raise_for_status()
+            return response.json()
+
+    _TAVILY_TOOL = TavilySearchResults(
+        api_wrapper=_PooledTavilyAPIWrapper(),
+        max_results=5,
+        include_answer=True,
+        include_raw_content=False,
+    )
+    _TAVILY_ERROR = ""
+except Exception as e:
+    _TAVILY_TOOL = None
+    _TAVILY_ERROR = f"{type(e).__name__}: {e}"
 
-    Prefer Tavily (real web search).
-    If Tavily or API key is missing, fall back to LLM-only notes.
 
-    Uses clarification_answers if present.
+# Worker threads for the sync research node's concurrent searches, started
+# once and reused by every run (not a new pool per node call)
+_SEARCH_POOL = ThreadPoolExecutor(
+    max_workers=RESEARCH_MAX_CONCURRENCY, thread_name_prefix="tavily"
+)
+
+
+# Searches in flight, by normalized query: a concurrent identical search
+# (parallel runs, speculative research) waits for it instead of re-sending it
+_inflight_searches: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+class _SearchAbandoned(Exception):
+    """The owner of an in-flight search was cancelled before it finished."""
+
+
+def _search_key(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _cached_result(key: str):
+    if SEARCH_CACHE_TTL > 0:
+        cached = search_cache.get(key)
+        if cached is not None:
+            return orjson.loads(cached)
+    return None
+
+
+def _join_search(key: str) -> Tuple[Future, bool]:
+    """The in-flight future for `key`, and whether the caller must run it."""
+    with _inflight_lock:
+        future = _inflight_searches.get(key)
+        if future is not None:
+            return future, False
+        future = _inflight_searches[key] = Future()
+        # running: a cancelled waiter can't cancel the owner's future
+        future.set_running_or_notify_cancel()
+        return future, True
+
+
+def _finish_search(key: str, future: Future, result=None, error=None) -> None:
+    with _inflight_lock:
+        del _inflight_searches[key]
+    if error is not None:
+        # A cancelled (or interrupted) owner has no result to share: the
+        # waiters get _SearchAbandoned and run the search themselves.
+        if not isinstance(error, Exception):
+            error = _SearchAbandoned()
+        future.set_exception(error)
+        return
+    if SEARCH_CACHE_TTL > 0 and isinstance(result, list):
+        search_cache.set(key, orjson.dumps(result).decode())
+    future.set_result(result)
+
+
+def _cached_search(tool, query: str):
+    """
+    tool.invoke() memoized by normalized query (case and whitespace folded):
+    replays and HITL iterations reuse the previous results for free, and
+    identical searches running at the same time are sent once.
+    Only successful (list) results are stored.
     """
+    key = _search_key(query)
+    while True:
+        cached = _cached_result(key)
+        if cached is not None:
+            return cached
+        future, owner = _join_search(key)
+        if owner:
+            break
+        try:
+            return future.result()
+        except _SearchAbandoned:
+            continue
+
+    try:
+        result = tool.invoke({"query": query})
+    except BaseException as e:
+        _finish_search(key, future, error=e)
+        raise
+    _finish_search(key, future, result)
+    return result
+
+
+async def _acached_search(tool, query: str):
+    """Async `_cached_search` (tool.ainvoke, same cache and in-flight table)."""
+    key = _search_key(query)
+    while True:
+        cached = _cached_result(key)
+        if cached is not None:
+            return cached
+        future, owner = _join_search(key)
+        if owner:
+            break
+        try:
+            # shielded: cancelling this waiter must not cancel the owner
+            return await asyncio.shield(asyncio.wrap_future(future))
+        except _SearchAbandoned:
+            continue
+
+    try:
+        result = await tool.ainvoke({"query": query})
+    except BaseException as e:
+        _finish_search(key, future, error=e)
+        raise
+    _finish_search(key, future, result)
+    return result
+
+
+def _research_queries(state: EssayState) -> Tuple[List[str], bool]:
+    """Web sub-queries for the plan, and whether clarifications are used."""
     topic = state.get("topic", "")
     plan = state.get("plan", "")
     clarification_answers = state.get("clarification_answers", "")
 
-    query = (
-        f"Essay topic: {topic}. Use this outline to guide research: {plan}. "
-        f"Take into account these clarifications from the human (if any): {clarification_answers}"
+    clarifications_used = bool((clarification_answers or "").strip())
+    context = (
+        f" Take into account: {clarification_answers}" if clarifications_used else ""
+    )
+    sections = _plan_sections(plan, RESEARCH_MAX_QUERIES)
+    queries = [f"Essay topic: {topic}. Section: {section}.{context}" for section in sections]
+    if not queries:
+        queries = [
+            f"Essay topic: {topic}. Use this outline to guide research: {plan}.{context}"
+        ]
+    return queries, clarifications_used
+
+
+def _format_hit(hit) -> str:
+    """One search result as a short note line (no score / raw JSON)."""
+    if not isinstance(hit, dict):
+        return f"- {hit}"
+    content = " ".join(str(hit.get("content", "")).split())
+    if len(content) > RESEARCH_SNIPPET_CHARS:
+        content = content[:RESEARCH_SNIPPET_CHARS].rsplit(" ", 1)[0] + "…"
+    return f"- {hit.get('title', '')}: {content} ({hit.get('url', '')})"
+
+
+def _research_notes(queries: List[str], results: List) -> str:
+    """
+    Search results as compact notes (title, trimmed snippet, URL), de-duplicated
+    by URL across queries: they go into every write_draft prompt, where the
+    raw result dicts were mostly scores and JSON punctuation.
+    """
+    seen_urls = set()
+    blocks = []
+    for query, result in zip(queries, results):
+        if isinstance(result, list):
+            hits = [
+                hit for hit in result
+                if not isinstance(hit, dict) or hit.get("url") not in seen_urls
+            ]
+            seen_urls.update(hit.get("url") for hit in hits if isinstance(hit, dict))
+            result = "\n".join(_format_hit(hit) for hit in hits)
+        blocks.append(f"Query: {query}\n\n{result}")
+
+    return "Web research (Tavily) results:\n\n" + "\n\n".join(blocks)
+
+
+def _research_error(e: Exception) -> str:
+    return (
+        "[Note: Tavily web search failed or is not configured. "
+        f"Error: {type(e).__name__}: {e}]"
     )
 
-    clarifications_used = bool((clarification_answers or "").strip())
 
-    # Try Tavily web search first
-    try:
-        try:
-            # recommended import
-            from langchain_community.tools.tavily_search.tool import (
-                TavilySearchResults,
-            )
-        except ImportError:
-            from langchain_community.tools.tavily_search import (  # type: ignore
-                TavilySearchResults,
-            )
+def research_agentic(state: EssayState) -> EssayState:
+    """
+    Agentic web search step (Tavily).
 
-        tavily_tool = TavilySearchResults(
-            max_results=5,
-            include_answer=True,
-            include_raw_content=False,
-        )
+    Runs in parallel with `research_background`; both branches are joined
+    before `write_draft`. If Tavily or its API key is missing, we only record
+    the error and let the LLM background notes carry the draft.
 
-        tavily_result = tavily_tool.invoke({"query": query})
+    One sub-query per outline section (up to RESEARCH_MAX_QUERIES), issued
+    concurrently: the searches are network-bound, so N sections cost about
+    the latency of one. Results are de-duplicated by URL and cached per
+    query (SEARCH_CACHE_TTL).
 
-        notes = (
-            "Web research (Tavily) results:\n\n"
-            f"Query: {query}\n\n"
-            f"{tavily_result}"
+    Uses clarification_answers if present.
+    """
+    queries, clarifications_used = _research_queries(state)
+
+    try:
+        if _TAVILY_TOOL is None:
+            raise RuntimeError(_TAVILY_ERROR)
+
+        results = list(
+            _SEARCH_POOL.map(lambda query: _cached_search(_TAVILY_TOOL, query), queries)
         )
+        notes = _research_notes(queries, results)
 
     except Exception as e:
-        # Fallback: use LLM-only 'research' when Tavily fails
-        system = (
-            "You are a research assistant. Based on the topic, outline, and any clarifications, "
-            "produce a short set of research notes (facts, arguments, references). "
-            "Do NOT write the full essay, just notes."
-        )
-        user = (
-            f"Topic: {topic}\n\nOutline:\n{plan}\n\n"
-            f"Clarification answers (may be empty): {clarification_answers}\n\n"
-            "We could not use a web search API (Tavily). "
-            "Just rely on your own knowledge to produce research notes."
-        )
+        notes = _research_error(e)
 
-        notes_llm = call_llm(system, user)
-        notes = (
-            f"{notes_llm}\n\n[Note: Tavily web search failed or is not configured. "
-            f"Error: {type(e).__name__}: {e}]"
-        )
+    return {
+        "research_notes": notes,
+        "clarifications_used": clarifications_used,
+    }
+
+
+async def aresearch_agentic(state: EssayState) -> EssayState:
+    """
+    Async `research_agentic`, used by the async graph (`build_async_graph`):
+    the sub-queries are awaited together (asyncio.gather, at most
+    RESEARCH_MAX_CONCURRENCY in flight) on the event loop, without a
+    thread pool.
+    """
+    queries, clarifications_used = _research_queries(state)
+
+    try:
+        if _TAVILY_TOOL is None:
+            raise RuntimeError(_TAVILY_ERROR)
+
+        slots = asyncio.Semaphore(RESEARCH_MAX_CONCURRENCY)
+
+        async def search(query: str):
+            async with slots:
+                return await _acached_search(_TAVILY_TOOL, query)
+
+        results = await asyncio.gather(*(search(query) for query in queries))
+        notes = _research_notes(queries, list(results))
+
+    except Exception as e:
+        notes = _research_error(e)
 
     return {
         "research_notes": notes,
@@ -211,68 +672,251 @@ def research_agentic(state: EssayState) -> EssayState:
     }
 
 
+BACKGROUND_SYSTEM_PROMPT = (
+    "You are a research assistant. Based on the topic, outline, and any clarifications, "
+    "produce a short set of research notes (facts, arguments, references). "
+    "Do NOT write the full essay, just notes."
+)
+
+
+def _background_prompt(state: EssayState) -> str:
+    topic = state.get("topic", "")
+    plan = state.get("plan", "")
+    clarification_answers = state.get("clarification_answers", "")
+
+    return (
+        f"Topic: {topic}\n\nOutline:\n{plan}\n\n"
+        f"Clarification answers (may be empty): {clarification_answers}\n\n"
+        "Rely on your own knowledge to produce research notes."
+    )
+
+
+def research_background(state: EssayState) -> EssayState:
+    """
+    LLM-only research notes, produced concurrently with the web search.
+
+    Neither branch depends on the other, so LangGraph runs them in the same
+    step and the slower one sets the latency instead of their sum.
+
+    The notes only depend on the subject, so those of a near-identical
+    topic + outline are reused (semantic cache). Plans, drafts and critiques
+    are specific to one essay and stay on the exact-match cache.
+    """
+    user = _background_prompt(state)
+    notes = background_cache.get(user)
+    if notes is None:
+        notes = call_llm(BACKGROUND_SYSTEM_PROMPT, user)
+        background_cache.set(user, notes)
+    return {"background_notes": notes}
+
+
+async def aresearch_background(state: EssayState) -> EssayState:
+    """Async `research_background` (acall_llm), used by the async graph."""
+    user = _background_prompt(state)
+    # The embedding request is blocking: keep it off the event loop
+    notes = await asyncio.to_thread(background_cache.get, user)
+    if notes is None:
+        notes = await acall_llm(BACKGROUND_SYSTEM_PROMPT, user)
+        await asyncio.to_thread(background_cache.set, user, notes)
+    return {"background_notes": notes}
+
+
+def _needs_auto_revision(state: EssayState) -> bool:
+    """
+    The AI reviews the draft (skip_draft_review, no human decision) and the
+    critique of the current draft scored below AUTO_REVISE_MIN_SCORE:
+    rewrite it from the critique, at most MAX_AUTO_REVISIONS times.
+    """
+    return (
+        bool(state.get("skip_draft_review", False))
+        and state.get("draft_approved", None) is None
+        and state.get("critique_revision") == state.get("revision_count", 0)
+        and state.get("critique_score", AUTO_REVISE_MIN_SCORE) < AUTO_REVISE_MIN_SCORE
+        and state.get("auto_revision_count", 0) < MAX_AUTO_REVISIONS
+        and state.get("revision_count", 0) < MAX_DRAFT_REVISIONS
+    )
+
+
+WRITE_SYSTEM_PROMPT = (
+    "You are a senior essay writer. Write a coherent essay following the outline.\n"
+    "If there is a previous version, improve it; otherwise, draft from scratch.\n"
+    "If there is HUMAN FEEDBACK on the draft, use it to guide your improvements.\n"
+    "Aim for clarity, structure, and good academic style."
+)
+
+
 def write_draft(state: EssayState) -> EssayState:
     """
     Write a draft essay using topic, instructions, plan, and research notes.
 
     Can optionally integrate draft_feedback_human on later runs.
+
+    Every HITL call replays the graph, so an existing draft is only
+    rewritten when there is new human feedback on it (or a low critic score
+    when the AI reviews the draft), and at most MAX_DRAFT_REVISIONS times
+    per thread.
+
+    The first draft is written by the cheaper `draft_llm`; revisions
+    escalate to the main `llm`.
     """
     topic = state.get("topic", "")
     instructions = state.get("instructions", "")
     plan = state.get("plan", "")
     research_notes = state.get("research_notes", "")
+    background_notes = state.get("background_notes", "")
     previous_draft = state.get("draft", "")
-    draft_feedback_human = state.get("draft_feedback_human", "")
+    draft_feedback_human = (state.get("draft_feedback_human") or "").strip()
+    revision_count = state.get("revision_count", 0)
+    auto_revision = bool(previous_draft) and _needs_auto_revision(state)
+
+    if previous_draft and not auto_revision and (
+        draft_feedback_human == state.get("draft_feedback_applied", "")
+        or revision_count >= MAX_DRAFT_REVISIONS
+    ):
+        return {}
 
-    system = (
-        "You are a senior essay writer. Write a coherent essay following the outline.\n"
-        "If there is a previous version, improve it; otherwise, draft from scratch.\n"
-        "If there is HUMAN FEEDBACK on the draft, use it to guide your improvements.\n"
-        "Aim for clarity, structure, and good academic style."
-    )
+    # Thread context first (identical for every revision, so it stays in
+    # OpenAI's prompt cache), then the parts that change between revisions.
     user = (
         f"Topic: {topic}\n"
         f"Instructions: {instructions}\n\n"
         f"Outline:\n{plan}\n\n"
         f"Research notes:\n{research_notes}\n\n"
+        f"Background notes:\n{background_notes}\n\n"
         f"Previous draft (if any):\n{previous_draft}\n\n"
         f"Human feedback on draft (if any):\n{draft_feedback_human}"
     )
-
-    draft = call_llm(system, user)
-    return {"draft": draft}
+    if auto_revision:
+        user += f"\n\nCritique of the previous draft:\n{state.get('critique', '')}"
+
+    model = llm if previous_draft else draft_llm
+    draft = call_llm(WRITE_SYSTEM_PROMPT, user, model=model, stream=True)
+    update: EssayState = {
+        "draft": draft,
+        "draft_model": model.model_name,
+        "revision_count": revision_count + 1,
+        "draft_feedback_applied": draft_feedback_human,
+    }
+    if auto_revision:
+        update["auto_revision_count"] = state.get("auto_revision_count", 0) + 1
+    return update
+
+
+# Structured output for the critic: the API guarantees valid JSON
+CRITIQUE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "critique",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "strengths": {"type": "string"},
+                "weaknesses": {"type": "string"},
+                "suggested_changes": {"type": "string"},
+                "score": {"type": "integer", "minimum": 0, "maximum": 10},
+                "needs_revision": {"type": "boolean"},
+            },
+            "required": [
+                "strengths",
+                "weaknesses",
+                "suggested_changes",
+                "score",
+                "needs_revision",
+            ],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+CRITIC_SYSTEM_PROMPT = (
+    "You are an essay critic. Evaluate the draft against the topic and instructions.\n"
+    "1) List strengths and weaknesses.\n"
+    "2) Suggest concrete changes.\n"
+    "3) Give a quality score between 0 and 10, and say if the draft needs a revision."
+)
 
 
 def critic_node(state: EssayState) -> EssayState:
     """
     Critic / reflection node (no loop inside the graph).
     Produces a critique; any improvement loop is done across runs by the human.
+
+    The score and revision flag are kept as structured fields so routing
+    can use them; `critique` stays a readable text for the UI. A reply that
+    isn't the expected JSON (refusal, truncated output) is kept as the
+    critique with a neutral score.
+    Skipped when the current draft revision was already critiqued.
     """
+    revision_count = state.get("revision_count", 0)
+    if state.get("critique") and state.get("critique_revision") == revision_count:
+        return {}
+
     draft = state.get("draft", "")
     topic = state.get("topic", "")
     instructions = state.get("instructions", "")
 
-    system = (
-        "You are an essay critic. Evaluate the draft against the topic and instructions.\n"
-        "1) List strengths and weaknesses.\n"
-        "2) Give a quality score between 0 and 10."
-    )
     user = (
         f"Topic: {topic}\nInstructions: {instructions}\n\nDraft:\n{draft}"
     )
 
-    critique = call_llm(system, user)
-    return {"critique": critique}
+    reply = call_llm(
+        CRITIC_SYSTEM_PROMPT, user, response_format=CRITIQUE_RESPONSE_FORMAT
+    )
+    try:
+        result = orjson.loads(reply)
+        critique = (
+            f"Strengths:\n{result['strengths']}\n\n"
+            f"Weaknesses:\n{result['weaknesses']}\n\n"
+            f"Suggested changes:\n{result['suggested_changes']}\n\n"
+            f"Score: {result['score']}/10"
+        )
+    except (ValueError, KeyError, TypeError):
+        # Refusal or truncated reply: keep its text, with a neutral verdict
+        # (no automatic rewrite from it)
+        return {
+            "critique": reply.strip(),
+            "critique_score": AUTO_REVISE_MIN_SCORE,
+            "needs_revision": False,
+            "critique_revision": revision_count,
+        }
+
+    return {
+        "critique": critique,
+        "critique_score": result["score"],
+        "needs_revision": result["needs_revision"],
+        "critique_revision": revision_count,
+    }
+
+
+FINALIZE_SYSTEM_PROMPT = (
+    "You are improving an essay based on critic comments and HUMAN FINAL FEEDBACK.\n"
+    "Apply the requested changes while keeping quality high."
+)
 
 
-def save_to_db(state: EssayState) -> EssayState:
+def finalize_prompts(draft: str, critique: str, final_feedback: str) -> Tuple[str, str]:
     """
-    Conceptual 'Save to DB' node.
+    (system, user) prompts for the final polish.
 
-    The SqliteSaver already persists the whole state.
-    This node just marks that we've reached a 'frozen' intermediate result.
+    Shared with the Batch API path in `src/batch.py`.
     """
-    return {"saved": True}
+    user = (
+        f"Original draft:\n{draft}\n\n"
+        f"Critique:\n{critique}\n\n"
+        f"Human final feedback:\n{final_feedback}\n\n"
+        "Produce the final improved essay."
+    )
+    return FINALIZE_SYSTEM_PROMPT, user
+
+
+# Fields dropped from the state once the essay is finalized
+PRUNED_AFTER_FINALIZE: EssayState = {
+    "research_notes": "",
+    "background_notes": "",
+    "clarification_questions": "",
+}
 
 
 def finalize_essay(state: EssayState) -> EssayState:
@@ -280,65 +924,79 @@ def finalize_essay(state: EssayState) -> EssayState:
     Finalize answer for essay mode.
 
     Interprets 'final_feedback' (or legacy 'human_feedback') as
-    HITL final polish, and produces final_draft + answer.
+    HITL final polish, and produces the final essay as `answer` (not also
+    as `final_draft`: the state would carry the same essay twice).
+
+    Also marks the result as saved (formerly a separate `save` node: the
+    SqliteSaver already persists the state, so that was only an extra
+    checkpoint).
+
+    The research / background notes are only inputs of write_draft, and
+    the clarification questions were answered: they are cleared here so the
+    finished thread's checkpoints stay small (a later replay rebuilds them
+    from the search / LLM caches). The draft and critique are kept, further
+    final polishes start from them.
+
+    A replay reaching this node again with the same draft revision and
+    feedback keeps the stored answer instead of polishing it again.
     """
     draft = state.get("draft", "")
     critique = state.get("critique", "")
     # 'final_feedback' is the new name; keep 'human_feedback' as fallback
     final_feedback = state.get("final_feedback") or state.get("human_feedback", "")
-
-    if final_feedback:
-        system = (
-            "You are improving an essay based on critic comments and HUMAN FINAL FEEDBACK.\n"
-            "Apply the requested changes while keeping quality high."
-        )
-        user = (
-            f"Original draft:\n{draft}\n\n"
-            f"Critique:\n{critique}\n\n"
-            f"Human final feedback:\n{final_feedback}\n\n"
-            "Produce the final improved essay."
-        )
-        final_draft = call_llm(system, user)
+    revision_count = state.get("revision_count", 0)
+
+    if (
+        state.get("saved")
+        and state.get("answer")
+        and state.get("finalized_revision") == revision_count
+        and state.get("finalized_feedback", "") == final_feedback
+    ):
+        # this draft was already finalized with this feedback (possibly by
+        # the Batch API, see src/batch.py): keep the answer
+        final_draft = state["answer"]
+    elif final_feedback:
+        system, user = finalize_prompts(draft, critique, final_feedback)
+        final_draft = call_llm(system, user, stream=True)
     else:
         # no additional human feedback – just use the last draft
         final_draft = draft
 
     return {
-        "final_draft": final_draft,
         "final_approved": True,
         "answer": final_draft,
+        "saved": True,
+        "finalized_feedback": final_feedback,
+        "finalized_revision": revision_count,
+        **PRUNED_AFTER_FINALIZE,
     }
 
 
+BASIC_SYSTEM_PROMPT = (
+    "You are a helpful assistant. Answer the user question directly.\n"
+    "If the user asks for an essay-like answer, you can write a short structured reply, "
+    "but do NOT overcomplicate it."
+)
+
+
 def basic_llm_response(state: EssayState) -> EssayState:
     """
     Simple one-shot LLM answer for open questions (non-essay mode).
+    Reuses the answer of a near-identical question (semantic cache).
     """
     user_input = state["user_input"]
 
-    system = (
-        "You are a helpful assistant. Answer the user question directly.\n"
-        "If the user asks for an essay-like answer, you can write a short structured reply, "
-        "but do NOT overcomplicate it."
-    )
-    answer = call_llm(system, user_input)
-    return {"answer": answer}
-
+    cached_answer = answer_cache.get(user_input)
+    if cached_answer is not None:
+        return {"answer": cached_answer}
 
-# --- STOP NODES (HITL breakpoints, but DAG: no cycles) ---
-
-def stop_after_analyze(state: EssayState) -> EssayState:
-    """HITL gate: stop after analyze until clarifications are answered or skipped."""
-    return {}
-
-
-def stop_after_plan_review(state: EssayState) -> EssayState:
-    """HITL gate: stop after plan review until plan is validated or skipped."""
-    return {}
+    answer = call_llm(BASIC_SYSTEM_PROMPT, user_input)
+    answer_cache.set(user_input, answer)
+    return {"answer": answer}
 
 
-def stop_after_critic(state: EssayState) -> EssayState:
-    """HITL gate: stop after critic until draft is approved or skipped."""
+def intent_gate(state: EssayState) -> EssayState:
+    """Join point for the parallel classify + analyze branches."""
     return {}
 
 
@@ -368,28 +1026,42 @@ def route_from_analyze(state: EssayState) -> str:
     return "plan"
 
 
-def route_from_plan_review(state: EssayState) -> str:
+def route_from_gate(state: EssayState) -> str:
+    """
+    Once classify and analyze have both run: open questions go to the
+    basic reply, essays go through HITL gate 1.
+    """
+    if route_from_classify(state) == "basic_reply":
+        return "basic_reply"
+    return route_from_analyze(state)
+
+
+def route_from_plan_review(state: EssayState) -> Union[str, List[str]]:
     """
     If user did not choose to skip and plan_feedback is still empty,
-    stop here and wait for feedback. Otherwise go to research.
+    stop here and wait for feedback. Otherwise fan out to web research
+    and LLM background notes, which run in parallel.
     """
     feedback = (state.get("plan_feedback") or "").strip()
     skip = bool(state.get("skip_plan_review", False))
 
     if not feedback and not skip:
         return "stop_after_plan_review"
-    return "research"
+    return ["research", "background"]
 
 
 def route_from_critic(state: EssayState) -> str:
     """
     If user did not choose to skip and draft_approved is neither True nor False
     (i.e., no explicit human decision yet), stop here.
-    Otherwise go to save (then finalize).
+    If the AI reviews the draft and the critic scored it low, go back to write
+    once with the critique; otherwise go to finalize.
     """
     skip = bool(state.get("skip_draft_review", False))
     draft_approved = state.get("draft_approved", None)
 
     if not skip and draft_approved is None:
         return "stop_after_critic"
-    return "save"
+    if _needs_auto_revision(state):
+        return "write"
+    return "finalize"
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Deque, Iterator, Optional, Tuple, Union
+
+from .config import LLM_MAX_CONCURRENCY, OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT
+
+
+# (None, Event) for a blocked thread, (loop, future) for a coroutine
+_Waiter = Tuple[
+    Optional[asyncio.AbstractEventLoop], Union[threading.Event, asyncio.Future]
+]
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class _Slots:
+    """
+    Counting semaphore shared by threads and event loops.
+
+    Threads block on an Event, coroutines await a future of their own loop:
+    no thread is parked for an async caller. A released slot is handed to
+    the oldest waiter (sync or async) instead of being put back.
+    """
+
+    def __init__(self, value: int):
+        self._free = value
+        self._lock = threading.Lock()
+        self._waiters: Deque[_Waiter] = deque()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._free > 0:
+                self._free -= 1
+                return
+            event = threading.Event()
+            self._waiters.append((None, event))
+        event.wait()
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free > 0:
+                self._free -= 1
+                return
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, waiter))
+                    handed = False
+                except ValueError:
+                    handed = True  # a release already gave us the slot
+            if handed:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                if loop is None:
+                    waiter.set()
+                    return
+                try:
+                    loop.call_soon_threadsafe(_wake, waiter)
+                    return
+                except RuntimeError:
+                    continue  # its event loop is closed
+            self._free += 1
+
+
+class RateLimiter:
+    """
+    Client-side throttle for LLM calls (thread-safe).
+
+    Two token buckets refilled continuously over a minute (requests and
+    tokens), plus a semaphore bounding in-flight calls. Callers wait here
+    before hitting the API instead of getting 429s and retrying blindly.
+    """
+
+    def __init__(self, rpm: int, tpm: int, max_concurrency: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self._slots = _Slots(max_concurrency)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _reserve(self, tokens: int) -> float:
+        """Take one request and `tokens` tokens: 0.0, or the time to wait."""
+        # A single call larger than the whole budget must still go through
+        tokens = min(tokens, self.tpm)
+        with self._lock:
+            self._refill()
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0.0
+            return max(
+                (1 - self._requests) * 60 / self.rpm,
+                (tokens - self._tokens) * 60 / self.tpm,
+                0.01,
+            )
+
+    def acquire(self, tokens: int) -> None:
+        """Block until one request and `tokens` tokens are available."""
+        while True:
+            wait = self._reserve(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    @contextmanager
+    def limit(self, tokens: int) -> Iterator[None]:
+        """Hold a concurrency slot and the token budget for one call."""
+        self._slots.acquire()
+        try:
+            self.acquire(tokens)
+            yield
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def alimit(self, tokens: int) -> AsyncIterator[None]:
+        """Same as `limit`, without blocking the event loop while waiting."""
+        await self._slots.aacquire()
+        try:
+            while True:
+                wait = self._reserve(tokens)
+                if not wait:
+                    break
+                await asyncio.sleep(wait)
+            yield
+        finally:
+            self._slots.release()
+
+
+llm_rate_limiter = RateLimiter(OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT, LLM_MAX_CONCURRENCY)
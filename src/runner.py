@@ -1,9 +1,176 @@
+import asyncio
+import threading
 import uuid
-from typing import Optional
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 from .state import EssayState
 from .graph_builder import graph
-from .config import DEFAULT_RECURSION_LIMIT
+from .config import (
+    DEFAULT_RECURSION_LIMIT,
+    LLM_CACHE_TTL,
+    SEARCH_CACHE_TTL,
+    SPECULATIVE_RESEARCH,
+)
+from .nodes import (
+    classify_intents,
+    is_plan_approval,
+    research_agentic,
+    research_background,
+)
+
+# Requests packed into one classify_intents() call by run_essay_graphs()
+CLASSIFY_BATCH_SIZE = 8
+
+# Nodes whose LLM tokens are forwarded by stream_essay_graph()
+# (their call_llm calls use stream=True; the others are tagged "nostream")
+STREAMED_NODES = ("write", "finalize")
+
+
+def _build_input(
+    user_input: str,
+    *,
+    clarification_answers: Optional[str] = None,
+    plan_feedback: Optional[str] = None,
+    draft_feedback_human: Optional[str] = None,
+    draft_approved: Optional[bool] = None,
+    final_feedback: Optional[str] = None,
+    skip_clarification: bool = False,
+    skip_plan_review: bool = False,
+    skip_draft_review: bool = False,
+    mode: Optional[str] = None,
+) -> EssayState:
+    """Build the input state for one graph run from the HITL inputs."""
+    initial_state: EssayState = {
+        "user_input": user_input,
+    }
+
+    # Pre-computed intent: classify_intent then skips its LLM call
+    if mode:
+        initial_state["mode"] = mode  # type: ignore[typeddict-item]
+
+    if clarification_answers:
+        initial_state["clarification_answers"] = clarification_answers
+    if plan_feedback:
+        initial_state["plan_feedback"] = plan_feedback
+    if draft_feedback_human:
+        initial_state["draft_feedback_human"] = draft_feedback_human
+    if draft_approved is not None:
+        initial_state["draft_approved"] = draft_approved
+    if final_feedback:
+        initial_state["final_feedback"] = final_feedback
+
+    # Skip flags
+    initial_state["skip_clarification"] = skip_clarification
+    initial_state["skip_plan_review"] = skip_plan_review
+    initial_state["skip_draft_review"] = skip_draft_review
+
+    return initial_state
+
+
+# Run config shared by every call; only the thread id changes
+_BASE_CONFIG = {"recursion_limit": DEFAULT_RECURSION_LIMIT}
+
+
+def _build_config(thread_id: str) -> dict:
+    return {**_BASE_CONFIG, "configurable": {"thread_id": thread_id}}
+
+
+# Speculative research, per thread waiting at the plan review gate: the web
+# search and the background notes, submitted side by side (as in the graph).
+# An entry is dropped once its research is done (the results are in the
+# caches), and the oldest pending ones beyond SPECULATIVE_MAX_THREADS are
+# cancelled, so threads abandoned at the gate don't pile up.
+SPECULATIVE_MAX_THREADS = 32
+_speculative_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative")
+_speculative_research: "OrderedDict[str, Tuple[Future, ...]]" = OrderedDict()
+_speculative_lock = threading.Lock()
+
+
+def _run_speculative(node, state: EssayState) -> None:
+    # The node's results are kept by the search / LLM caches, not the future
+    node(state)
+
+
+def _forget_speculative_research(thread_id: str, futures: Tuple[Future, ...]) -> None:
+    if not all(future.done() for future in futures):
+        return
+    with _speculative_lock:
+        if _speculative_research.get(thread_id) is futures:
+            del _speculative_research[thread_id]
+
+
+def _start_speculative_research(thread_id: str, result: EssayState) -> None:
+    """
+    Once a run stops at the plan review gate, start the research on the plan
+    shown to the human instead of waiting for their answer.
+
+    The nodes' search and LLM calls are cached, so when the plan is accepted
+    as is, the next call's `research` / `background` nodes find their
+    results ready. Plan feedback rewrites the plan: the cache keys differ
+    and the speculative work is simply not used.
+    """
+    if not SPECULATIVE_RESEARCH or LLM_CACHE_TTL <= 0 or SEARCH_CACHE_TTL <= 0:
+        return
+    if result.get("mode") != "essay" or not result.get("plan_validated"):
+        return
+    if result.get("draft") or result.get("research_notes"):
+        return  # research already done on this thread
+
+    state = dict(result)
+    evicted: List[Future] = []
+    with _speculative_lock:
+        if thread_id in _speculative_research:
+            return
+        futures = (
+            _speculative_pool.submit(_run_speculative, research_agentic, state),
+            _speculative_pool.submit(_run_speculative, research_background, state),
+        )
+        _speculative_research[thread_id] = futures
+        while len(_speculative_research) > SPECULATIVE_MAX_THREADS:
+            evicted.extend(_speculative_research.popitem(last=False)[1])
+    for future in evicted:
+        future.cancel()
+    for future in futures:
+        future.add_done_callback(
+            lambda _: _forget_speculative_research(thread_id, futures)
+        )
+
+
+def _take_speculative_research(
+    thread_id: str, plan_feedback: Optional[str]
+) -> Tuple[Future, ...]:
+    """
+    Futures of the thread's speculative research, to wait for before running
+    the graph again (their results are about to be read from the cache).
+    Empty when there are none, or when plan feedback makes them useless
+    (then they are cancelled if they have not started yet).
+    """
+    with _speculative_lock:
+        futures = _speculative_research.pop(thread_id, ())
+    if not is_plan_approval(plan_feedback):
+        for future in futures:
+            future.cancel()
+        return ()
+    return futures
+
+
+def _wait_speculative_research(
+    thread_id: str, plan_feedback: Optional[str]
+) -> None:
+    # Failures are ignored: the graph's own nodes redo (and report) them
+    wait(_take_speculative_research(thread_id, plan_feedback))
+
+
+async def _await_speculative_research(
+    thread_id: str, plan_feedback: Optional[str]
+) -> None:
+    futures = _take_speculative_research(thread_id, plan_feedback)
+    await asyncio.gather(
+        *(asyncio.wrap_future(future) for future in futures),
+        return_exceptions=True,
+    )
 
 
 def run_essay_graph(
@@ -18,6 +185,7 @@ def run_essay_graph(
     skip_clarification: bool = False,
     skip_plan_review: bool = False,
     skip_draft_review: bool = False,
+    mode: Optional[str] = None,
 ) -> EssayState:
     """
     Convenience wrapper to run the graph.
@@ -30,37 +198,176 @@ def run_essay_graph(
         -> plan + plan_review, then STOP_AFTER_PLAN_REVIEW (plan shown).
     - Call 3: same thread_id + plan_feedback OR skip_plan_review=True
         -> research + write + critic, then STOP_AFTER_CRITIC (draft+critique).
+        (The research was already started in the background after call 2.)
     - Call 4: same thread_id + draft_approved=True OR skip_draft_review=True
-        -> save + finalize, returns final answer.
+        -> finalize (marked saved), returns final answer.
     """
     # Treat empty string as "no thread"
     if not thread_id:
         thread_id = str(uuid.uuid4())
 
-    initial_state: EssayState = {
-        "user_input": user_input,
-    }
+    initial_state = _build_input(
+        user_input,
+        clarification_answers=clarification_answers,
+        plan_feedback=plan_feedback,
+        draft_feedback_human=draft_feedback_human,
+        draft_approved=draft_approved,
+        final_feedback=final_feedback,
+        skip_clarification=skip_clarification,
+        skip_plan_review=skip_plan_review,
+        skip_draft_review=skip_draft_review,
+        mode=mode,
+    )
 
-    if clarification_answers:
-        initial_state["clarification_answers"] = clarification_answers
-    if plan_feedback:
-        initial_state["plan_feedback"] = plan_feedback
-    if draft_feedback_human:
-        initial_state["draft_feedback_human"] = draft_feedback_human
-    if draft_approved is not None:
-        initial_state["draft_approved"] = draft_approved
-    if final_feedback:
-        initial_state["final_feedback"] = final_feedback
+    _wait_speculative_research(thread_id, plan_feedback)
 
-    # Skip flags
-    initial_state["skip_clarification"] = skip_clarification
-    initial_state["skip_plan_review"] = skip_plan_review
-    initial_state["skip_draft_review"] = skip_draft_review
-
-    config = {
-        "configurable": {"thread_id": thread_id},
-        "recursion_limit": DEFAULT_RECURSION_LIMIT,
-    }
+    config = _build_config(thread_id)
     result: EssayState = graph.invoke(initial_state, config=config)  # type: ignore[assignment]
+    _start_speculative_research(thread_id, result)
     result["thread_id"] = thread_id  # type: ignore[index]
     return result
+
+
+async def arun_essay_graph(
+    async_graph: Any,
+    user_input: str,
+    thread_id: Optional[str] = None,
+    **hitl_inputs: Any,
+) -> EssayState:
+    """
+    Async variant of run_essay_graph (same keyword arguments), for a graph
+    built with `build_async_graph()`: checkpoints are written through
+    aiosqlite, so the event loop is never blocked.
+    """
+    if not thread_id:
+        thread_id = str(uuid.uuid4())
+
+    await _await_speculative_research(thread_id, hitl_inputs.get("plan_feedback"))
+
+    initial_state = _build_input(user_input, **hitl_inputs)
+    config = _build_config(thread_id)
+    result: EssayState = await async_graph.ainvoke(initial_state, config=config)
+    _start_speculative_research(thread_id, result)
+    result["thread_id"] = thread_id  # type: ignore[index]
+    return result
+
+
+# stream_mode of the streaming runners (see _stream_events)
+_STREAM_MODES = ["messages", "updates", "values"]
+
+
+def _stream_events(mode: str, payload: Any) -> Iterator[Tuple[str, Any]]:
+    """Token / update events for one chunk of graph.stream / graph.astream."""
+    if mode == "messages":
+        chunk, metadata = payload
+        node = metadata.get("langgraph_node")
+        if node in STREAMED_NODES and chunk.content:
+            yield "token", (node, chunk.content)
+    elif mode == "updates":
+        for node, values in payload.items():
+            if values:
+                yield "update", (node, values)
+
+
+def stream_essay_graph(
+    user_input: str,
+    thread_id: Optional[str] = None,
+    **hitl_inputs: Any,
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Streaming variant of run_essay_graph (same keyword arguments).
+
+    Yields `(event, payload)` tuples while the graph runs:
+
+    - ("token", (node, text)): LLM tokens from the nodes in STREAMED_NODES,
+      so the draft / final essay can be displayed while it is being written.
+    - ("update", (node, values)): state written by a node as soon as it
+      finishes (e.g. the draft is shown while the critic is still running).
+    - ("state", EssayState): the final state, always the last event.
+    """
+    if not thread_id:
+        thread_id = str(uuid.uuid4())
+
+    _wait_speculative_research(thread_id, hitl_inputs.get("plan_feedback"))
+
+    initial_state = _build_input(user_input, **hitl_inputs)
+    config = _build_config(thread_id)
+
+    result: EssayState = {}
+    for mode, payload in graph.stream(
+        initial_state, config=config, stream_mode=_STREAM_MODES
+    ):
+        if mode == "values":
+            result = payload
+        else:
+            yield from _stream_events(mode, payload)
+
+    _start_speculative_research(thread_id, result)
+    result["thread_id"] = thread_id  # type: ignore[index]
+    yield "state", result
+
+
+async def astream_essay_graph(
+    async_graph: Any,
+    user_input: str,
+    thread_id: Optional[str] = None,
+    **hitl_inputs: Any,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Async variant of stream_essay_graph (same events), for a graph built
+    with `build_async_graph()`: a streaming request holds no worker thread
+    while it waits for tokens.
+    """
+    if not thread_id:
+        thread_id = str(uuid.uuid4())
+
+    await _await_speculative_research(thread_id, hitl_inputs.get("plan_feedback"))
+
+    initial_state = _build_input(user_input, **hitl_inputs)
+    config = _build_config(thread_id)
+
+    result: EssayState = {}
+    async for mode, payload in async_graph.astream(
+        initial_state, config=config, stream_mode=_STREAM_MODES
+    ):
+        if mode == "values":
+            result = payload
+        else:
+            for event in _stream_events(mode, payload):
+                yield event
+
+    _start_speculative_research(thread_id, result)
+    result["thread_id"] = thread_id  # type: ignore[index]
+    yield "state", result
+
+
+def run_essay_graphs(
+    user_inputs: List[str],
+    *,
+    batch_size: int = CLASSIFY_BATCH_SIZE,
+    **hitl_inputs: Any,
+) -> List[EssayState]:
+    """
+    Run the graph for many new requests (one new thread each).
+
+    Intents are classified `batch_size` requests at a time with a single
+    LLM call, then passed as `mode` so each run skips its own classify call.
+    The runs themselves are executed concurrently (graph.batch), bounded by
+    the LLM rate limiter rather than run one after the other.
+    Keyword arguments are the HITL inputs of run_essay_graph().
+    """
+    modes: List[Optional[str]] = []
+    for start in range(0, len(user_inputs), batch_size):
+        modes.extend(classify_intents(user_inputs[start:start + batch_size]))
+
+    thread_ids = [str(uuid.uuid4()) for _ in user_inputs]
+    results: List[EssayState] = graph.batch(  # type: ignore[assignment]
+        [
+            _build_input(user_input, mode=mode, **hitl_inputs)
+            for user_input, mode in zip(user_inputs, modes)
+        ],
+        config=[_build_config(thread_id) for thread_id in thread_ids],
+    )
+    for result, thread_id in zip(results, thread_ids):
+        result["thread_id"] = thread_id  # type: ignore[index]
+    return results
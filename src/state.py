@@ -22,21 +22,31 @@ class EssayState(TypedDict, total=False):
     plan_feedback: str                    # feedback humain sur le plan (HITL 2)
     plan_validated: bool                  # plan validé ou pas
     research_notes: str                   # collected references / notes
+    background_notes: str                 # LLM-only notes (parallel branch)
 
     # Drafting & critique
     draft: str
     draft_feedback_human: str             # feedback humain sur le draft (HITL 3)
     draft_approved: bool                  # décision humaine sur draft
+    draft_feedback_applied: str           # feedback déjà intégré au draft
+    revision_count: int                   # nombre de drafts écrits (thread)
+    draft_model: str                      # model that wrote the current draft
     critique: str
+    critique_score: int                   # 0-10, from the critic's JSON
+    needs_revision: bool                  # critic's verdict on the draft
+    critique_revision: int                # revision_count critiqued last
+    auto_revision_count: int              # critic-driven rewrites (skip_draft_review)
 
     # Save to DB
     saved: bool                           # marquer un état « figé »
 
     # Final answer
-    final_draft: str                      # version finale interne
+    final_draft: str                      # legacy: the final essay is `answer`
     final_feedback: str                   # feedback humain de finition (HITL 4)
     final_approved: bool                  # validation finale
     answer: str                           # renvoyé au front
+    finalized_feedback: str               # final_feedback de `answer`
+    finalized_revision: int               # revision_count de `answer`
 
     # Optional legacy human feedback (for backward compat)
     human_feedback: str
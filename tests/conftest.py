@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+# src.config needs an API key, and the caches / checkpointer open their
+# SQLite files at import time: point them at a scratch directory.
+_TMP = tempfile.mkdtemp(prefix="agentic_system_tests_")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ["LLM_CACHE_DB"] = os.path.join(_TMP, "llm_cache.sqlite")
+os.environ["CHECKPOINTS_DB"] = os.path.join(_TMP, "checkpoints.sqlite")
+os.environ.pop("TAVILY_API_KEY", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,33 @@
+from src import batch, nodes
+from src.graph_builder import graph
+
+
+def test_applied_batch_answer_survives_replay(monkeypatch):
+    config = {"configurable": {"thread_id": "batch-replay"}}
+    graph.update_state(
+        config,
+        {"draft": "Draft essay.", "critique": "Fine.", "revision_count": 1},
+        as_node="critic",
+    )
+    submitted = []
+    monkeypatch.setattr(
+        batch, "submit_batch", lambda requests: submitted.append(requests) or "batch-1"
+    )
+    monkeypatch.setattr(
+        batch,
+        "get_batch_results",
+        lambda batch_id: ("completed", {"batch-replay": "Polished essay."}),
+    )
+
+    assert batch.submit_finalize_batch([("batch-replay", "Shorter please.")]) == "batch-1"
+    assert [req["custom_id"] for req in submitted[0]] == ["batch-replay"]
+    assert batch.apply_finalize_batch("batch-1")["thread_ids"] == ["batch-replay"]
+
+    def no_llm(*args, **kwargs):
+        raise AssertionError("the batch answer must not be polished again")
+
+    # a replay past the critic gate runs finalize on the stored state
+    monkeypatch.setattr(nodes, "call_llm", no_llm)
+    values = graph.get_state(config).values
+    assert nodes.finalize_essay(values)["answer"] == "Polished essay."
+    assert nodes.finalize_essay({**values, "final_feedback": ""})["answer"] == "Draft essay."
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from src import cache
+
+
+def test_embedding_failures_are_not_memoized(monkeypatch):
+    calls = []
+
+    def embed_query(text):
+        calls.append(text)
+        if len(calls) == 1:
+            raise TimeoutError("embedding API down")
+        return [3.0, 4.0]
+
+    cache._embed_cached.cache_clear()
+    monkeypatch.setattr(cache, "embeddings", SimpleNamespace(embed_query=embed_query))
+    try:
+        assert cache._embed("flaky") is None
+        assert cache._embed("flaky") is not None
+        assert cache._embed("flaky") is not None
+    finally:
+        cache._embed_cached.cache_clear()
+    assert calls == ["flaky", "flaky"]
+
+
+def test_expired_entries_are_purged_while_running(tmp_path, monkeypatch):
+    llm_cache = cache.LLMCache(str(tmp_path / "cache.sqlite"), ttl=60)
+    monkeypatch.setattr(llm_cache, "PURGE_EVERY", 3)
+    clock = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: clock[0])
+
+    llm_cache.set("old", "reply")
+    clock[0] += 120  # "old" expires
+    llm_cache.set("new-1", "reply")
+
+    def rows():
+        return llm_cache._conn.execute("SELECT key FROM llm_cache").fetchall()
+
+    assert len(rows()) == 2
+    llm_cache.set("new-2", "reply")  # third write: purge
+    assert sorted(key for (key,) in rows()) == ["new-1", "new-2"]
@@ -0,0 +1,60 @@
+import importlib.util
+import sqlite3
+import sys
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from src import db
+from src.db import CompressedSerializer, checkpoint_serde
+
+BIG_STATE = {"draft": "An essay paragraph. " * 200, "revision_count": 2}
+SMALL_STATE = {"plan": "- Intro", "revision_count": 1}
+
+
+def test_small_payloads_stay_uncompressed():
+    type_, data = checkpoint_serde.dumps_typed(SMALL_STATE)
+    assert "+" not in type_
+    assert checkpoint_serde.loads_typed((type_, data)) == SMALL_STATE
+
+
+def test_large_payloads_round_trip_compressed():
+    plain_type, plain = CompressedSerializer(min_size=10**9).dumps_typed(BIG_STATE)
+    type_, data = checkpoint_serde.dumps_typed(BIG_STATE)
+    assert type_ == f"{plain_type}+zstd"
+    assert len(data) < len(plain)
+    assert checkpoint_serde.loads_typed((type_, data)) == BIG_STATE
+
+
+def _load_db_module(monkeypatch, name):
+    # A separate copy of src/db.py, imported with zstandard unavailable
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    spec = importlib.util.spec_from_file_location(name, db.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_zlib_fallback_without_zstandard(monkeypatch):
+    fallback = _load_db_module(monkeypatch, "db_without_zstd")
+    type_, data = fallback.checkpoint_serde.dumps_typed(BIG_STATE)
+    assert type_.endswith("+zlib")
+    assert fallback.checkpoint_serde.loads_typed((type_, data)) == BIG_STATE
+    # zlib rows also load where zstandard is installed
+    assert checkpoint_serde.loads_typed((type_, data)) == BIG_STATE
+
+
+def test_legacy_uncompressed_checkpoints_load(tmp_path):
+    conn = sqlite3.connect(tmp_path / "checkpoints.sqlite", check_same_thread=False)
+    config = {"configurable": {"thread_id": "legacy", "checkpoint_ns": ""}}
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = dict(BIG_STATE)
+
+    # written by the baseline checkpointer (default serde, no compression)
+    SqliteSaver(conn).put(config, checkpoint, {}, {})
+    ((type_, size),) = conn.execute(
+        "SELECT type, length(checkpoint) FROM checkpoints"
+    ).fetchall()
+    assert "+" not in type_ and size > 1024
+    loaded = SqliteSaver(conn, serde=checkpoint_serde).get_tuple(config)
+    assert loaded.checkpoint["channel_values"] == BIG_STATE
@@ -0,0 +1,29 @@
+from src import nodes
+from src.graph_builder import graph
+
+
+class _NoAnswerCache:
+    def get(self, text):
+        return None
+
+    def set(self, text, value):
+        pass
+
+
+def test_open_question_skips_the_analysis(monkeypatch):
+    systems = []
+
+    def fake_call_llm(system, user, **kwargs):
+        systems.append(system)
+        return "Lima."
+
+    monkeypatch.setattr(nodes, "call_llm", fake_call_llm)
+    monkeypatch.setattr(nodes, "answer_cache", _NoAnswerCache())
+
+    result = graph.invoke(
+        {"user_input": "What is the capital of Peru?"},
+        {"configurable": {"thread_id": "open-question"}},
+    )
+    assert result["mode"] == "open_question"
+    assert result["answer"] == "Lima."
+    assert systems == [nodes.BASIC_SYSTEM_PROMPT]
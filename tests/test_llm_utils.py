@@ -0,0 +1,23 @@
+from langchain_core.runnables import RunnableLambda
+
+from src import llm_utils
+
+
+def _kwargs(config=None):
+    prepare = RunnableLambda(
+        lambda system: llm_utils._prepare_call(system, "user", None, None)[3]
+    )
+    return prepare.invoke("system", config)
+
+
+def test_prompt_cache_key_is_per_thread():
+    first = _kwargs({"configurable": {"thread_id": "thread-1"}})
+    again = _kwargs({"configurable": {"thread_id": "thread-1"}})
+    other = _kwargs({"configurable": {"thread_id": "thread-2"}})
+    assert first["prompt_cache_key"] == again["prompt_cache_key"]
+    assert first["prompt_cache_key"] != other["prompt_cache_key"]
+
+
+def test_no_prompt_cache_key_outside_a_thread():
+    assert "prompt_cache_key" not in _kwargs()
+    assert "prompt_cache_key" not in llm_utils._prepare_call("system", "user", None, None)[3]
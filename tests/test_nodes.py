@@ -0,0 +1,334 @@
+import asyncio
+
+import orjson
+
+from src import nodes
+
+
+class _SlowSearchTool:
+    """Stands in for the Tavily tool: counts calls, answers after a delay."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, payload):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return [{"url": "https://example.com", "content": payload["query"]}]
+
+
+def test_cancelled_search_owner_releases_inflight_entry(monkeypatch):
+    monkeypatch.setattr(nodes, "SEARCH_CACHE_TTL", 0)
+    tool = _SlowSearchTool()
+
+    async def scenario():
+        owner = asyncio.create_task(nodes._acached_search(tool, "cancelled query"))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(nodes._acached_search(tool, "cancelled query"))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        # the waiter takes the search over instead of hanging
+        result = await asyncio.wait_for(waiter, timeout=1)
+        assert owner.cancelled()
+        return result
+
+    result = asyncio.run(scenario())
+    assert result == [{"url": "https://example.com", "content": "cancelled query"}]
+    assert tool.calls == 2
+    assert nodes._inflight_searches == {}
+    # and a later identical search runs normally
+    assert asyncio.run(nodes._acached_search(tool, "cancelled query")) == result
+    assert nodes._inflight_searches == {}
+
+
+def test_match_intent_fast_paths():
+    assert nodes._match_intent("What is the capital of Peru?") == "open_question"
+    assert nodes._match_intent("Où se trouve Lima ?") == "open_question"
+    assert nodes._match_intent("Write an essay on owls") == "essay"
+    assert nodes._match_intent("Write me a 500-word essay about owls") == "essay"
+    assert nodes._match_intent("Rédige une dissertation sur Rousseau") == "essay"
+    assert nodes._match_intent("Écris un essai sur la liberté") == "essay"
+    assert nodes._match_intent("How do I write an essay?") is None
+
+
+def test_match_intent_leaves_requests_to_the_classifier():
+    for user_input in (
+        "Can you write a 1000-word piece on climate change for my class?",
+        "Do a 3-page paper on the French revolution",
+        "Is it possible to get a long-form analysis of Brexit causes?",
+        "What were the economic, social and political causes of the French "
+        "revolution, and how did they interact?",
+    ):
+        assert nodes._match_intent(user_input) is None
+
+
+def test_match_intent_essay_mentions_are_not_essay_requests():
+    for user_input in (
+        "What are tips for writing a good essay?",
+        "Proofread my essay",
+        "Summarize Montaigne's Essays",
+        "Is a dissertation longer than a thesis?",
+        "Translate 'essay' into French",
+    ):
+        assert nodes._match_intent(user_input) != "essay"
+
+
+def test_analyze_topic_falls_back_to_the_request(monkeypatch):
+    monkeypatch.setattr(nodes, "call_llm", lambda *args, **kwargs: "TOPIC: owls")
+    assert nodes.analyze_topic({"user_input": " Write an essay on owls "}) == {
+        "topic": "Write an essay on owls",
+        "instructions": "",
+        "clarification_questions": "",
+    }
+
+
+def test_plan_approval():
+    for feedback in (None, "", "  ", "ok", "OK!", "Looks good.", "lgtm", "très bien"):
+        assert nodes.is_plan_approval(feedback)
+    for feedback in ("no", "redo", "fix", "nope", "Add a section on history"):
+        assert not nodes.is_plan_approval(feedback)
+
+
+class _StubLLM:
+    """Replaces nodes.call_llm: records the calls, answers with `reply`."""
+
+    def __init__(self, reply="LLM reply"):
+        self.reply = reply
+        self.calls = []
+
+    def __call__(self, system, user, **kwargs):
+        self.calls.append((system, user, kwargs))
+        return self.reply(user) if callable(self.reply) else self.reply
+
+
+def _critique(score, needs_revision=False):
+    return orjson.dumps(
+        {
+            "strengths": "Clear.",
+            "weaknesses": "Short.",
+            "suggested_changes": "Expand.",
+            "score": score,
+            "needs_revision": needs_revision,
+        }
+    ).decode()
+
+
+DRAFTED = {
+    "topic": "Owls",
+    "plan": "- Intro",
+    "draft": "Draft 1",
+    "revision_count": 1,
+    "draft_feedback_applied": "",
+}
+
+
+def test_write_draft_first_draft_uses_the_draft_model(monkeypatch):
+    stub = _StubLLM("Draft 1")
+    monkeypatch.setattr(nodes, "call_llm", stub)
+    update = nodes.write_draft({"topic": "Owls", "plan": "- Intro"})
+    assert update["draft"] == "Draft 1"
+    assert update["revision_count"] == 1
+    assert stub.calls[0][2]["model"] is nodes.draft_llm
+
+
+def test_write_draft_skipped_without_new_feedback(monkeypatch):
+    stub = _StubLLM()
+    monkeypatch.setattr(nodes, "call_llm", stub)
+    assert nodes.write_draft(DRAFTED) == {}
+    assert nodes.write_draft({**DRAFTED, "draft_feedback_human": "  "}) == {}
+    assert stub.calls == []
+
+
+def test_write_draft_revises_on_new_feedback(monkeypatch):
+    stub = _StubLLM("Draft 2")
+    monkeypatch.setattr(nodes, "call_llm", stub)
+    update = nodes.write_draft({**DRAFTED, "draft_feedback_human": "More examples"})
+    assert update["draft"] == "Draft 2"
+    assert update["revision_count"] == 2
+    assert update["draft_feedback_applied"] == "More examples"
+    assert stub.calls[0][2]["model"] is nodes.llm
+
+
+def test_write_draft_stops_at_the_revision_limit(monkeypatch):
+    stub = _StubLLM()
+    monkeypatch.setattr(nodes, "call_llm", stub)
+    state = {
+        **DRAFTED,
+        "revision_count": nodes.MAX_DRAFT_REVISIONS,
+        "draft_feedback_human": "Again",
+    }
+    assert nodes.write_draft(state) == {}
+    assert stub.calls == []
+
+
+def test_critic_skipped_when_the_revision_was_critiqued(monkeypatch):
+    stub = _StubLLM(_critique(9))
+    monkeypatch.setattr(nodes, "call_llm", stub)
+    critiqued = {**DRAFTED, "critique": "Fine.", "critique_revision": 1}
+    assert nodes.critic_node(critiqued) == {}
+    assert stub.calls == []
+
+    update = nodes.critic_node({**critiqued, "revision_count": 2})
+    assert update["critique_score"] == 9
+    assert update["critique_revision"] == 2
+
+
+def test_route_from_critic_waits_for_the_human():
+    assert nodes.route_from_critic(DRAFTED) == "stop_after_critic"
+    assert nodes.route_from_critic({**DRAFTED, "draft_approved": True}) == "finalize"
+
+
+def test_single_auto_revision_on_a_low_score(monkeypatch):
+    monkeypatch.setattr(nodes, "call_llm", _StubLLM(_critique(5, True)))
+    state = {**DRAFTED, "skip_draft_review": True}
+    state.update(nodes.critic_node(state))
+    assert nodes.route_from_critic(state) == "write"
+
+    stub = _StubLLM("Draft 2")
+    monkeypatch.setattr(nodes, "call_llm", stub)
+    state.update(nodes.write_draft(state))
+    assert state["draft"] == "Draft 2"
+    assert state["auto_revision_count"] == 1
+    assert "Critique of the previous draft" in stub.calls[0][1]
+
+    # still scored low: no second automatic rewrite
+    monkeypatch.setattr(nodes, "call_llm", _StubLLM(_critique(4, True)))
+    state.update(nodes.critic_node(state))
+    assert state["critique_revision"] == 2
+    assert nodes.route_from_critic(state) == "finalize"
+
+
+def test_no_auto_revision_on_a_good_score_or_past_the_limit(monkeypatch):
+    monkeypatch.setattr(nodes, "call_llm", _StubLLM(_critique(8)))
+    state = {**DRAFTED, "skip_draft_review": True}
+    state.update(nodes.critic_node(state))
+    assert nodes.route_from_critic(state) == "finalize"
+
+    low = {
+        **state,
+        "critique_score": 3,
+        "revision_count": nodes.MAX_DRAFT_REVISIONS,
+        "critique_revision": nodes.MAX_DRAFT_REVISIONS,
+    }
+    assert nodes.route_from_critic(low) == "finalize"
+    assert nodes.write_draft(low) == {}
+
+
+def test_critic_uses_the_strict_score_schema(monkeypatch):
+    stub = _StubLLM(_critique(7, True))
+    monkeypatch.setattr(nodes, "call_llm", stub)
+    update = nodes.critic_node(DRAFTED)
+
+    response_format = stub.calls[0][2]["response_format"]
+    assert response_format is nodes.CRITIQUE_RESPONSE_FORMAT
+    assert response_format["json_schema"]["strict"] is True
+    score = response_format["json_schema"]["schema"]["properties"]["score"]
+    assert (score["minimum"], score["maximum"]) == (0, 10)
+    assert update["critique_score"] == 7
+    assert update["needs_revision"] is True
+    assert update["critique"].endswith("Score: 7/10")
+
+
+def test_critic_survives_a_reply_that_is_not_json(monkeypatch):
+    for reply in ("I can't help with that.", '{"strengths": "Clear.", "weak'):
+        monkeypatch.setattr(nodes, "call_llm", _StubLLM(reply))
+        state = {**DRAFTED, "skip_draft_review": True}
+        update = nodes.critic_node(state)
+        assert update["critique"] == reply
+        assert update["critique_score"] == nodes.AUTO_REVISE_MIN_SCORE
+        assert update["needs_revision"] is False
+        assert nodes.route_from_critic({**state, **update}) == "finalize"
+
+
+def test_plan_sections_numbered_and_bulleted():
+    numbered = "1. Introduction\n2) Causes\n   - nested detail\n\n3. 1990s fashion"
+    assert nodes._plan_sections(numbered, 6) == [
+        "Introduction",
+        "Causes",
+        "1990s fashion",
+    ]
+    bulleted = "- Intro\n* Body\n• Conclusion\n  * nested\n- intro"
+    assert nodes._plan_sections(bulleted, 6) == ["Intro", "Body", "Conclusion"]
+    assert nodes._plan_sections("I. Origins\nII. Legacy", 6) == ["Origins", "Legacy"]
+    assert nodes._plan_sections(bulleted, 2) == ["Intro", "Body"]
+
+
+def test_research_queries_fall_back_to_the_whole_plan():
+    assert nodes._plan_sections("", 6) == []
+    queries, clarified = nodes._research_queries({"topic": "Owls", "plan": ""})
+    assert queries == ["Essay topic: Owls. Use this outline to guide research: ."]
+    assert clarified is False
+
+    queries, clarified = nodes._research_queries(
+        {"topic": "Owls", "plan": "- Diet", "clarification_answers": "For kids"}
+    )
+    assert queries == ["Essay topic: Owls. Section: Diet. Take into account: For kids"]
+    assert clarified is True
+
+
+def test_research_notes_merge_and_trim(monkeypatch):
+    monkeypatch.setattr(nodes, "RESEARCH_SNIPPET_CHARS", 20)
+    shared = {
+        "title": "Owls",
+        "url": "https://a.example",
+        "content": "Owls  hunt\nat night.",
+    }
+    results = [
+        [shared, {"title": "Diet", "url": "https://b.example", "content": "x " * 30}],
+        [shared, "plain hit"],
+        "[Note: Tavily web search failed]",
+    ]
+    notes = nodes._research_notes(["q1", "q2", "q3"], results)
+    assert notes == (
+        "Web research (Tavily) results:\n\n"
+        "Query: q1\n\n"
+        "- Owls: Owls hunt at night. (https://a.example)\n"
+        "- Diet: x x x x x x x x x x… (https://b.example)\n\n"
+        "Query: q2\n\n"
+        "- plain hit\n\n"
+        "Query: q3\n\n"
+        "[Note: Tavily web search failed]"
+    )
+
+
+class _DictCache:
+    """Stands in for a SemanticCache (exact lookups only)."""
+
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+
+    def get(self, text):
+        return self.entries.get(text)
+
+    def set(self, text, value):
+        self.entries[text] = value
+
+
+PLANNED = {"topic": "Owls", "plan": "- Diet\n- Habitat"}
+
+
+def test_research_background_cache_miss_then_hit(monkeypatch):
+    cache = _DictCache()
+    stub = _StubLLM("Owls are nocturnal.")
+    monkeypatch.setattr(nodes, "background_cache", cache)
+    monkeypatch.setattr(nodes, "call_llm", stub)
+
+    expected = {"background_notes": "Owls are nocturnal."}
+    assert nodes.research_background(PLANNED) == expected
+    assert list(cache.entries.values()) == ["Owls are nocturnal."]
+    assert len(stub.calls) == 1
+
+    assert nodes.research_background(PLANNED) == expected
+    assert len(stub.calls) == 1
+
+
+def test_aresearch_background_uses_the_same_cache(monkeypatch):
+    cache = _DictCache({nodes._background_prompt(PLANNED): "Cached notes."})
+    monkeypatch.setattr(nodes, "background_cache", cache)
+
+    async def no_llm(*args, **kwargs):
+        raise AssertionError("cache hit expected")
+
+    monkeypatch.setattr(nodes, "acall_llm", no_llm)
+    result = asyncio.run(nodes.aresearch_background(PLANNED))
+    assert result == {"background_notes": "Cached notes."}
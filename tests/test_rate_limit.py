@@ -0,0 +1,138 @@
+import asyncio
+import threading
+
+import pytest
+
+from src import rate_limit
+from src.rate_limit import RateLimiter
+
+
+def _free_slots(limiter):
+    return limiter._slots._free
+
+
+def test_alimit_waits_for_a_slot_and_releases_it_on_cancel():
+    limiter = RateLimiter(rpm=10_000, tpm=1_000_000, max_concurrency=1)
+
+    async def scenario():
+        async with limiter.alimit(10):
+            waiter = asyncio.create_task(limiter.alimit(10).__aenter__())
+            await asyncio.sleep(0.05)
+            assert not waiter.done()
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+        # neither the holder nor the cancelled waiter kept the slot
+        async with limiter.alimit(10):
+            pass
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=2))
+    assert _free_slots(limiter) == 1
+
+
+def test_async_waiters_park_no_thread():
+    limiter = RateLimiter(rpm=10_000, tpm=1_000_000, max_concurrency=1)
+    order = []
+
+    async def call(n):
+        async with limiter.alimit(10):
+            order.append(n)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        threads = threading.active_count()
+        tasks = [asyncio.create_task(call(n)) for n in range(5)]
+        await asyncio.sleep(0.005)
+        assert threading.active_count() == threads
+        await asyncio.gather(*tasks)
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=2))
+    assert order == [0, 1, 2, 3, 4]
+    assert _free_slots(limiter) == 1
+
+
+def test_slots_are_shared_by_sync_and_async_callers():
+    limiter = RateLimiter(rpm=10_000, tpm=1_000_000, max_concurrency=1)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def sync_call():
+        with limiter.limit(10):
+            entered.set()
+            release.wait(timeout=2)
+
+    thread = threading.Thread(target=sync_call)
+    thread.start()
+    entered.wait(timeout=2)
+
+    async def scenario():
+        slot = limiter.alimit(10)
+        waiter = asyncio.create_task(slot.__aenter__())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()  # the thread holds the only slot
+        release.set()
+        await asyncio.wait_for(waiter, timeout=2)
+        assert _free_slots(limiter) == 0  # handed over to the coroutine
+        await slot.__aexit__(None, None, None)
+        assert _free_slots(limiter) == 1
+
+    asyncio.run(scenario())
+    thread.join(timeout=2)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _limiter_at(monkeypatch, rpm, tpm):
+    clock = _Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return RateLimiter(rpm=rpm, tpm=tpm, max_concurrency=4), clock
+
+
+def test_reserve_waits_for_the_request_bucket(monkeypatch):
+    limiter, clock = _limiter_at(monkeypatch, rpm=60, tpm=1_000_000)
+    for _ in range(60):
+        assert limiter._reserve(10) == 0.0
+    # empty: one request refills in 60 / rpm = 1s
+    assert limiter._reserve(10) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert limiter._reserve(10) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert limiter._reserve(10) == 0.0
+
+
+def test_reserve_waits_for_the_token_bucket(monkeypatch):
+    limiter, clock = _limiter_at(monkeypatch, rpm=1_000, tpm=6_000)
+    assert limiter._reserve(5_000) == 0.0
+    # 1000 tokens left, 3000 needed: 2000 tokens at 100/s
+    assert limiter._reserve(3_000) == pytest.approx(20.0)
+    clock.now += 20
+    assert limiter._reserve(3_000) == 0.0
+
+
+def test_call_larger_than_the_tpm_is_clamped(monkeypatch):
+    limiter, clock = _limiter_at(monkeypatch, rpm=1_000, tpm=6_000)
+    assert limiter._reserve(50_000) == 0.0  # full bucket: goes through
+    assert limiter._reserve(50_000) == pytest.approx(60.0)  # waits a refill
+    clock.now += 60
+    assert limiter._reserve(50_000) == 0.0
+
+
+def test_cancelled_waiter_gives_back_a_handed_slot():
+    limiter = RateLimiter(rpm=10_000, tpm=1_000_000, max_concurrency=1)
+
+    async def scenario():
+        limiter._slots.acquire()
+        waiter = asyncio.create_task(limiter._slots.aacquire())
+        await asyncio.sleep(0)  # queued behind the held slot
+        limiter._slots.release()  # handed over, wake-up scheduled
+        waiter.cancel()  # ... but cancelled before it runs
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert waiter.cancelled()
+
+    asyncio.run(scenario())
+    assert _free_slots(limiter) == 1
@@ -0,0 +1,61 @@
+import threading
+
+from src import runner
+
+PLAN_GATE_STATE = {"mode": "essay", "plan_validated": True, "plan": "- Intro"}
+
+
+def _blocking_nodes(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def node(state):
+        calls.append(state["plan"])
+        release.wait(timeout=5)
+        return {"research_notes": "notes"}
+
+    monkeypatch.setattr(runner, "research_agentic", node)
+    monkeypatch.setattr(runner, "research_background", node)
+    return release, calls
+
+
+def test_speculative_research_start_then_consume(monkeypatch):
+    release, calls = _blocking_nodes(monkeypatch)
+    runner._start_speculative_research("spec-consume", PLAN_GATE_STATE)
+    assert "spec-consume" in runner._speculative_research
+
+    futures = runner._take_speculative_research("spec-consume", "looks good")
+    assert len(futures) == 2
+    assert "spec-consume" not in runner._speculative_research
+    release.set()
+    # the futures don't hold the research results (the caches do)
+    assert [future.result(timeout=5) for future in futures] == [None, None]
+    assert calls == ["- Intro", "- Intro"]
+
+
+def test_speculative_research_start_then_abandon(monkeypatch):
+    release, _ = _blocking_nodes(monkeypatch)
+    runner._start_speculative_research("spec-abandon", PLAN_GATE_STATE)
+    futures = runner._speculative_research["spec-abandon"]
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    # finished research leaves no entry behind for a thread never resumed
+    assert "spec-abandon" not in runner._speculative_research
+
+
+def test_speculative_research_discarded_on_plan_feedback(monkeypatch):
+    release, _ = _blocking_nodes(monkeypatch)
+    runner._start_speculative_research("spec-rejected", PLAN_GATE_STATE)
+    assert runner._take_speculative_research("spec-rejected", "redo") == ()
+    assert "spec-rejected" not in runner._speculative_research
+    release.set()
+
+
+def test_speculative_research_is_bounded(monkeypatch):
+    release, _ = _blocking_nodes(monkeypatch)
+    monkeypatch.setattr(runner, "SPECULATIVE_MAX_THREADS", 2)
+    for n in range(4):
+        runner._start_speculative_research(f"spec-bounded-{n}", PLAN_GATE_STATE)
+    assert list(runner._speculative_research) == ["spec-bounded-2", "spec-bounded-3"]
+    release.set()